@@ -0,0 +1,173 @@
+import sys
+from operator import attrgetter
+
+# Output column -> attribute of AdapterRow; iflow-level columns live on the
+# IflowInfo that every row of the same iflow shares
+FIELD_PATHS = {
+    'UID': 'iflow.uid',
+    'Package': 'iflow.package',
+    'Iflow': 'iflow.name',
+    'IflowID': 'iflow.iflow_id',
+    'IflowVersion': 'iflow.version',
+    'Fingerprint': 'iflow.fingerprint',
+    'AdapterType': 'adapter_type',
+    'TransportProtocol': 'transport_protocol',
+    'AdapterDirection': 'direction',
+    'AdapterName': 'name',
+    'AdapterVersion': 'version',
+    'AdapterAddress': 'address',
+    'IsParametrized': 'is_parametrized',
+    'ResolvedParameters': 'resolved',
+    'UnresolvedParameters': 'unresolved',
+    'ParameterSources': 'sources',
+    'CallsIflow': 'calls',
+    'IsCalledByIflow': 'called_by',
+}
+FIELD_GETTERS = {name: attrgetter(path) for name, path in FIELD_PATHS.items()}
+
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def text(value):
+    # Extracted rows hold None/bools, CSV rows hold strings
+    return '' if value is None else str(value)
+
+
+def is_true(value):
+    # Extracted rows hold bools, CSV rows hold 'True'/'False', the catalog 0/1
+    return bool(value) and value not in ('False', '0')
+
+
+class IflowInfo:
+    __slots__ = ('uid', 'package', 'name', 'iflow_id', 'version', 'fingerprint')
+
+    def __init__(self, uid, package, name, iflow_id, version, fingerprint=None):
+        self.uid = intern(uid)
+        self.package = intern(package)
+        self.name = intern(name)
+        self.iflow_id = intern(iflow_id)
+        self.version = intern(version)
+        self.fingerprint = fingerprint
+
+
+class AdapterRow:
+    # One message flow. Supports the read/write mapping operations the rest of
+    # the code uses on rows (row['AdapterType'], row.get(...), dict(row)...).
+
+    __slots__ = ('iflow', 'adapter_type', 'transport_protocol', 'direction', 'name', 'version', 'address',
+                 'is_parametrized', 'resolved', 'unresolved', 'sources', 'calls', 'called_by')
+
+    def __init__(self, iflow):
+        self.iflow = iflow
+        self.adapter_type = None
+        self.transport_protocol = None
+        self.direction = None
+        self.name = None
+        self.version = None
+        self.address = None
+        self.is_parametrized = False
+        self.resolved = 0
+        self.unresolved = ''
+        self.sources = ''
+        self.calls = None
+        self.called_by = None
+
+    def __getitem__(self, key):
+        return FIELD_GETTERS[key](self)
+
+    def __setitem__(self, key, value):
+        target, _, attribute = FIELD_PATHS[key].rpartition('.')
+        setattr(self.iflow if target else self, attribute, value)
+
+    def __contains__(self, key):
+        return key in FIELD_PATHS
+
+    def __iter__(self):
+        return iter(FIELD_PATHS)
+
+    def __len__(self):
+        return len(FIELD_PATHS)
+
+    def __repr__(self):
+        return f"AdapterRow({dict(self.items())!r})"
+
+    def get(self, key, default=None):
+        getter = FIELD_GETTERS.get(key)
+        return default if getter is None else getter(self)
+
+    def setdefault(self, key, default=None):
+        value = self.get(key)
+        if value is None:
+            self[key] = value = default
+        return value
+
+    def keys(self):
+        return FIELD_PATHS.keys()
+
+    def items(self):
+        return [(name, getter(self)) for name, getter in FIELD_GETTERS.items()]
+
+
+class RowBatch(list):
+    # The adapter rows of one iflow, plus the step tables extracted in the same
+    # pass (table name -> list of dict rows)
+
+    def __init__(self, rows=(), tables=None):
+        super().__init__(rows)
+        self.tables = tables or {}
+
+
+# Row-level attributes, i.e. everything but the shared IflowInfo
+ROW_ATTRIBUTES = AdapterRow.__slots__[1:]
+
+
+def from_dicts(rows, uid, package):
+    # Rows of one inner zip (e.g. from the cache) share a single IflowInfo
+    iflow = None
+    result = []
+    for data in rows:
+        if iflow is None:
+            iflow = IflowInfo(uid, package, data.get('Iflow'), data.get('IflowID'), data.get('IflowVersion'),
+                              data.get('Fingerprint'))
+        row = AdapterRow(iflow)
+        for name, value in data.items():
+            if name in FIELD_PATHS and FIELD_PATHS[name][:6] != 'iflow.':
+                row[name] = intern(value)
+        result.append(row)
+    return result
+
+
+def copy_rows(rows, uid, package):
+    # The rows of an identical iflow, under another UID and Package
+    iflow = None
+    result = []
+    for source in rows:
+        if iflow is None:
+            info = source.iflow
+            iflow = IflowInfo(uid, package, info.name, info.iflow_id, info.version, info.fingerprint)
+        row = AdapterRow(iflow)
+        for attribute in ROW_ATTRIBUTES:
+            setattr(row, attribute, getattr(source, attribute))
+        result.append(row)
+    return result
+
+
+def tuple_getter(fieldnames):
+    getter = attrgetter(*(FIELD_PATHS[name] for name in fieldnames))
+    if len(fieldnames) == 1:
+        return lambda row: (getter(row),)
+    return getter
+
+
+def as_tuples(rows, fieldnames):
+    # Values in fieldnames order; plain dict rows (e.g. read back from a CSV) also work
+    getter = None
+    for row in rows:
+        if type(row) is AdapterRow:
+            if getter is None:
+                getter = tuple_getter(fieldnames)
+            yield getter(row)
+        else:
+            yield tuple(row.get(name) for name in fieldnames)
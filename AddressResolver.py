@@ -0,0 +1,146 @@
+import json
+import os
+import re
+import string
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'adapter_rules.json')
+ANY_DIRECTION = '*'
+DEFAULT_FALLBACK_PATTERN = 'url'
+
+
+def load_rules(path):
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+    if not isinstance(rules, dict):
+        raise ValueError(f"the rules in {path} must be a JSON object")
+    if not isinstance(rules.get('adapters', {}), dict):
+        raise ValueError(f"'adapters' must be an object in {path}")
+    return rules
+
+
+def normalize_candidates(value):
+    # ["key", ...] | {"keys": [...]} | {"template": "..."} | [candidate, ...]
+    if isinstance(value, dict):
+        value = [value]
+    candidates = []
+    keys = []
+    for item in value:
+        if isinstance(item, str):
+            keys.append(item)
+            continue
+        if keys:
+            candidates.append({'keys': keys})
+            keys = []
+        candidates.append(item)
+    if keys:
+        candidates.append({'keys': keys})
+    return candidates
+
+
+def normalize_rule(rule):
+    # A list applies to every direction; a dict maps Sender/Receiver/* to candidates
+    if isinstance(rule, list):
+        return {ANY_DIRECTION: normalize_candidates(rule)}
+    if 'keys' in rule or 'template' in rule:
+        return {ANY_DIRECTION: normalize_candidates(rule)}
+    return {direction: normalize_candidates(value) for direction, value in rule.items()}
+
+
+def compile_template(template):
+    return tuple(string.Formatter().parse(template))
+
+
+def render_template(parts, properties):
+    rendered = []
+    for literal, field, _, _ in parts:
+        rendered.append(literal)
+        if field is not None:
+            value = properties.get(field)
+            if not value:
+                return None
+            rendered.append(value)
+    return ''.join(rendered)
+
+
+def compile_candidate(candidate):
+    conditions = tuple(candidate.get('when', {}).items())
+    if 'template' in candidate:
+        return 'template', conditions, compile_template(candidate['template'])
+    if 'keys' in candidate:
+        return 'keys', conditions, tuple(candidate['keys'])
+    raise ValueError(f"Address rule needs 'keys' or 'template': {candidate}")
+
+
+class AddressResolver:
+    def __init__(self, layers):
+        # Later layers replace the whole rule of an adapter type
+        adapters = {}
+        fallback = DEFAULT_FALLBACK_PATTERN
+        for layer in layers:
+            for ctype, rule in layer.get('adapters', {}).items():
+                adapters[ctype] = normalize_rule(rule)
+            fallback = layer.get('fallback_key_pattern', fallback)
+
+        # (type, direction) -> compiled candidates, so a flow needs a single lookup
+        self.table = {
+            (ctype, direction): tuple(compile_candidate(c) for c in candidates)
+            for ctype, directions in adapters.items()
+            for direction, candidates in directions.items()
+        }
+        self.fallback = re.compile(fallback, re.IGNORECASE)
+        # Effective rule set, e.g. for cache invalidation
+        self.rules = {'adapters': adapters, 'fallback_key_pattern': fallback}
+
+    def resolve(self, ctype, direction, properties):
+        candidates = self.table.get((ctype, direction))
+        if candidates is None:
+            candidates = self.table.get((ctype, ANY_DIRECTION), ())
+
+        address = None
+        for kind, conditions, payload in candidates:
+            if conditions and any(properties.get(k) != v for k, v in conditions):
+                continue
+            if kind == 'keys':
+                # The first key that is present wins, even when its value is empty
+                found = next((k for k in payload if k in properties), None)
+                if found is not None:
+                    address = properties[found]
+                    break
+            else:
+                address = render_template(payload, properties)
+                if address:
+                    break
+
+        if not address:
+            search = self.fallback.search
+            for key, val in properties.items():
+                if val and search(key):
+                    address = val
+                    break
+        return address
+
+
+def legacy_layer(address_keys_by_type):
+    return {'adapters': address_keys_by_type, 'fallback_key_pattern': DEFAULT_FALLBACK_PATTERN}
+
+
+# One resolver per process and rule set, with the (path, mtime, size) of the files it
+# was built from; worker processes build their own
+_resolvers = {}
+
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def get_resolver(address_keys_by_type, rule_files=()):
+    # A modified rule file is loaded again, e.g. between two polls of watch mode
+    key = tuple(rule_files)
+    paths = ([RULES_FILE] if os.path.isfile(RULES_FILE) else []) + list(key)
+    stamps = tuple(file_stamp(path) for path in paths)
+    entry = _resolvers.get(key)
+    if entry is None or entry[0] != stamps:
+        layers = [legacy_layer(address_keys_by_type)] + [load_rules(path) for path in paths]
+        entry = _resolvers[key] = (stamps, AddressResolver(layers))
+    return entry[1]
@@ -0,0 +1,76 @@
+import itertools
+import os
+
+# Library entry points for running extractions inside another process: inputs are
+# given explicitly, nothing is written to disk or printed unless asked for, and the
+# extraction modules are only imported on first use.
+
+
+def ignore(message):
+    pass
+
+
+def is_bytes(value):
+    return isinstance(value, (bytes, bytearray, memoryview))
+
+
+def is_source(value):
+    return (isinstance(value, (str, os.PathLike)) or is_bytes(value) or hasattr(value, 'read')
+            or isinstance(value, tuple) and len(value) == 2 and is_bytes(value[1]))
+
+
+def package_sources(sources):
+    # Accepts one source or a list of them: paths (str or os.PathLike) of package zips
+    # or of directories holding them, the bytes of a package zip, (name, bytes) pairs
+    # and binary file objects
+    import AutomaticASIS
+    if is_source(sources):
+        sources = [sources]
+    packages = []
+    for number, source in enumerate(sources, 1):
+        if is_bytes(source):
+            packages.append(AutomaticASIS.PackageBytes(f'<package {number}>', bytes(source)))
+        elif isinstance(source, tuple):
+            name, data = source
+            packages.append(AutomaticASIS.PackageBytes(name, bytes(data)))
+        elif hasattr(source, 'read'):
+            name = getattr(source, 'name', None)
+            name = os.path.basename(name) if isinstance(name, str) else f'<package {number}>'
+            packages.append(AutomaticASIS.PackageBytes(name, source.read()))
+        else:
+            packages.extend(AutomaticASIS.discover_inputs([os.fspath(source)]))
+    return packages
+
+
+def extract_batches(sources, progress=None, **options):
+    # Yields the rows of each iflow as a list, in UID order. Archives are always read
+    # in memory. `progress` receives the lines the CLI prints. `options` are those of
+    # AutomaticASIS.iter_package_flows (jobs, streaming, cache_path, adapter_rules,
+    # parameter_files, artifacts, use_async...); with artifacts, each list also has
+    # the step tables of its iflow in `.tables`.
+    import AutomaticASIS
+    return AutomaticASIS.iter_package_flows(package_sources(sources), **dict(options, in_memory=True,
+                                                                              progress=progress or ignore))
+
+
+def extract(sources, progress=None, **options):
+    # Yields the adapter rows of every iflow, one at a time. Rows are mappings with every
+    # key of AdapterRows.FIELD_PATHS, not only the AutomaticASIS.FIELDNAMES the CLI
+    # writes by default: the parameter columns stay at their defaults without parameter
+    # files and the link columns stay None until link() fills them. dict(row) makes a
+    # plain copy.
+    return itertools.chain.from_iterable(extract_batches(sources, progress, **options))
+
+
+def link(rows):
+    # Fills in CallsIflow/IsCalledByIflow between ProcessDirect senders and receivers;
+    # needs every row at once, so it returns them as a list
+    import InternalCalls
+    rows = list(rows)
+    InternalCalls.link_flows(rows)
+    return rows
+
+
+def call_graph(rows):
+    import CallGraph
+    return CallGraph.CallGraph.from_rows(rows)
@@ -1,11 +1,25 @@
+import collections
+import io
+import itertools
 import os
+import posixpath
 import shutil
 import zipfile
-import xml.etree.ElementTree as ET
 import csv
 import re
 import secrets
 import string
+import time
+
+import AdapterRows
+import AddressResolver
+import ExtractionCache
+import IflowArtifacts
+import InternalCalls
+import OutputWriters
+import Parameters
+import Profiling
+import RunManifest
 
 ADDRESS_KEYS_BY_TYPE = {
     'HTTPS': ['urlPath'],
@@ -22,7 +36,25 @@ ADDRESS_KEYS_BY_TYPE = {
     'JDBC': ['alias'] 
 }
 
+FIELDNAMES = ['UID', 'Package', 'Iflow', 'IflowID', 'IflowVersion', 'AdapterType', 'TransportProtocol',
+              'AdapterDirection', 'AdapterName', 'AdapterVersion', 'AdapterAddress', 'IsParametrized', 'Fingerprint']
+LINK_FIELDNAMES = ['CallsIflow', 'IsCalledByIflow']
+PARAMETER_FIELDNAMES = ['ResolvedParameters', 'UnresolvedParameters', 'ParameterSources']
+INVENTORY_FIELDNAMES = ['UID', 'Package', 'Iflow', 'IflowID', 'IflowVersion']
+ZIP_SIGNATURE = b'PK\x03\x04'
+
 TEMP_DIR = './temp'
+# Default files of Catalog.py and EndpointIndex.py, repeated here so that parsing
+# the command line imports neither module
+CATALOG_FILE = 'automatic_asis_catalog.sqlite'
+ENDPOINTS_FILE = 'automatic_asis_endpoints.json'
+DEFAULT_WATCH_INTERVAL = 30
+DEFAULT_PREFETCH = 4
+DEFAULT_PREFETCH_MB = 256
+MAX_PARSED_IFLOWS = 4096
+
+# A package zip given as bytes instead of a path (see AsisApi)
+PackageBytes = collections.namedtuple('PackageBytes', 'name data')
 
 
 def unzip_file(zip_path, extract_to):
@@ -40,32 +72,21 @@ def find_iflw_file(root_dir):
     raise FileNotFoundError("No .iflw file found in extracted content.")
 
 
-def strip_namespace(tag):
-    return tag.split('}', 1)[-1] if '}' in tag else tag
+def load_parameters(root_dir):
+    path = Parameters.find_parameters_file(root_dir)
+    return Parameters.load_properties(path) if path else {}
 
 
-def load_parameters(root_dir):
-    params = {}
-    for root, _, files in os.walk(root_dir):
-        if 'parameters.prop' in files:
-            with open(os.path.join(root, 'parameters.prop'), encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        key = key.replace('\\ ', ' ').strip()
-                        params[key] = value.strip()
-            break
-    return params
+def read_file_bytes(path):
+    if not path or not os.path.isfile(path):
+        return b''
+    with open(path, 'rb') as f:
+        return f.read()
 
 
-def parse_manifest(manifest_path):
+def read_manifest(f):
     bundle_name = version = bundle_id = None
-    if not os.path.isfile(manifest_path):
-        return bundle_name, version, bundle_id
-
-    with open(manifest_path, encoding='utf-8') as f:
-        content = f.read()
+    content = f.read()
 
     lines = []
     for line in content.splitlines():
@@ -85,14 +106,25 @@ def parse_manifest(manifest_path):
     return bundle_name, version, bundle_id
 
 
+def parse_manifest(manifest_path):
+    if not os.path.isfile(manifest_path):
+        return None, None, None
+    with open(manifest_path, encoding='utf-8') as f:
+        return read_manifest(f)
+
+
+def read_package_name(f):
+    for line in f:
+        if line.startswith('Name='):
+            return line.split('=', 1)[1].strip()
+    return 'Unknown'
+
+
 def parse_package_name(export_info_path):
     if not os.path.exists(export_info_path):
         return 'Unknown'
     with open(export_info_path, encoding='utf-8') as f:
-        for line in f:
-            if line.startswith('Name='):
-                return line.split('=', 1)[1].strip()
-    return 'Unknown'
+        return read_package_name(f)
 
 
 def generate_prefix_from_package(package_name):
@@ -101,92 +133,82 @@ def generate_prefix_from_package(package_name):
     return prefix[:5] if prefix else 'PKG'
 
 
-def extract_message_flows(iflw_path, iflow_name, iflow_id, version, parameters, package_name, uid):
-    tree = ET.parse(iflw_path)
-    root = tree.getroot()
-    results = []
-
-    for elem in root.iter():
-        if strip_namespace(elem.tag) == "messageFlow":
-            message_data = {
-                'UID': uid,
-                'Package': package_name,
-                'Iflow': iflow_name,
-                'IflowID': iflow_id,
-                'IflowVersion': version,
-                'AdapterType': None,
-                'TransportProtocol': None,
-                'AdapterDirection': None,
-                'AdapterName': None,
-                'AdapterVersion': None,
-                'AdapterAddress': None,
-                'IsParametrized': False
-            }
-
-            for child in elem:
-                if strip_namespace(child.tag) == "extensionElements":
-                    properties = {}
-                    for prop in child.iter():
-                        if strip_namespace(prop.tag) == "property":
-                            key = value = None
-                            for kv in prop:
-                                tag = strip_namespace(kv.tag)
-                                if tag == "key":
-                                    key = kv.text
-                                elif tag == "value":
-                                    value = kv.text
-                            if key:
-                                properties[key] = value
-
-                    message_data['AdapterType'] = properties.get('ComponentType')
-                    message_data['AdapterDirection'] = properties.get('direction')
-                    message_data['AdapterName'] = properties.get('Name')
-                    message_data['TransportProtocol'] = properties.get('TransportProtocol')
-                    message_data['AdapterVersion'] = properties.get('componentVersion')
-
-                    ctype = message_data['AdapterType']
-                    direction = message_data['AdapterDirection']
-                    possible_keys = ADDRESS_KEYS_BY_TYPE.get(ctype, {})
-                    if isinstance(possible_keys, dict):
-                        possible_keys = possible_keys.get(direction, [])
-
-                    address = None
-                    for k in possible_keys:
-                        if k in properties:
-                            address = properties[k]
-                            break
-                    if not address:
-                        for key, val in properties.items():
-                            if val and 'url' in key.lower():
-                                address = val
-                                break
-
-                    def substitute_param(match):
-                        param_key = match.group(1).strip()
-                        message_data['IsParametrized'] = True
-                        return parameters.get(param_key, match.group(0))
-
-                    if address:
-                        address = re.sub(r'{{(.*?)}}', substitute_param, address)
-
-                    message_data['AdapterAddress'] = address
-
-            if message_data['AdapterType']:
-                results.append(message_data)
-
-    return results
-
-
-def save_to_csv(data, output_path):
+def new_message_data(iflow):
+    # Rows of one iflow share its IflowInfo (UID, package, name, ID, version)
+    return AdapterRows.AdapterRow(iflow)
+
+
+def apply_adapter_properties(message_data, properties, parameters, resolver):
+    # Adapter type, direction, name... repeat across rows, so they are interned
+    intern = AdapterRows.intern
+    message_data.adapter_type = intern(properties.get('ComponentType'))
+    message_data.direction = intern(properties.get('direction'))
+    message_data.name = intern(properties.get('Name'))
+    message_data.transport_protocol = intern(properties.get('TransportProtocol'))
+    message_data.version = intern(properties.get('componentVersion'))
+
+    address = resolver.resolve(message_data.adapter_type, message_data.direction, properties)
+
+    if address:
+        address, resolved, unresolved, sources = Parameters.substitute(address, parameters)
+        if resolved or unresolved:
+            message_data.is_parametrized = True
+            message_data.resolved = resolved
+            message_data.unresolved = ', '.join(unresolved)
+            message_data.sources = ', '.join(sources)
+
+    message_data.address = address
+
+
+def substitute_parameters(address, parameters):
+    address, resolved, unresolved, _ = Parameters.substitute(address, parameters)
+    return address, bool(resolved or unresolved)
+
+
+def address_resolver(rule_files=()):
+    # ADDRESS_KEYS_BY_TYPE, then adapter_rules.json, then the user's rule files
+    return AddressResolver.get_resolver(ADDRESS_KEYS_BY_TYPE, rule_files)
+
+
+class MessageFlowExtractor(IflowArtifacts.Extractor):
+    # The adapter rows; step extractors can share its pass over the .iflw
+    name = 'adapters'
+    tags = ('messageFlow',)
+
+    def __init__(self, iflow, parameters, resolver=None):
+        super().__init__(iflow)
+        self.parameters = Parameters.as_layers(parameters)
+        # Looked up once per iflow, since getting a resolver checks the rule files
+        self.resolver = resolver or address_resolver()
+
+    def handle(self, elem, properties, scope):
+        if not properties:
+            return
+        message_data = new_message_data(self.iflow)
+        apply_adapter_properties(message_data, properties, self.parameters, self.resolver)
+        if message_data.adapter_type:
+            self.rows.append(message_data)
+
+
+def extract_message_flows(iflw_path, iflow_name, iflow_id, version, parameters, package_name, uid, stats=None,
+                          resolver=None, artifacts=(), streaming=False):
+    # Adapter rows, and the requested step tables, from a single pass over the .iflw.
+    # With streaming, finished elements are discarded as the file is read, which keeps
+    # memory low on large iflows.
+    iflow = AdapterRows.IflowInfo(uid, package_name, iflow_name, iflow_id, version)
+    adapters = MessageFlowExtractor(iflow, parameters, resolver)
+    steps = IflowArtifacts.create(artifacts, iflow)
+    IflowArtifacts.run_pass(iflw_path, [adapters] + steps, stats, streaming)
+    if not steps:
+        return adapters.rows
+    return AdapterRows.RowBatch(adapters.rows, {extractor.name: extractor.rows for extractor in steps})
+
+
+def save_to_csv(data, output_path, fieldnames=FIELDNAMES):
     with open(output_path, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(
-            file,
-            fieldnames=['UID', 'Package', 'Iflow', 'IflowID', 'IflowVersion', 'AdapterType', 'TransportProtocol',
-                        'AdapterDirection', 'AdapterName', 'AdapterVersion', 'AdapterAddress', 'IsParametrized'],
-            quoting=csv.QUOTE_ALL
-        )
-        writer.writeheader()
-        writer.writerows(data)
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(fieldnames)
+        writer.writerows(AdapterRows.as_tuples(data, fieldnames))
 
 
 def prepare_inner_zips(directory):
@@ -198,82 +220,1031 @@ def prepare_inner_zips(directory):
                 os.rename(file_path, new_file_path)
 
 
-def process_inner_zip(zip_path, package_name, iflow_index, uid_prefix):
+def run_extractor(iflw_file, iflw_size, iflow_name, iflow_id, version, parameters, package_name, uid, streaming,
+                  iflow, resolver=None, artifacts=()):
+    with Profiling.stage('parse', package_name, iflow) as record:
+        stats = {} if record is not None else None
+        flows = extract_message_flows(iflw_file, iflow_name, iflow_id, version, parameters, package_name, uid, stats,
+                                      resolver, artifacts, streaming)
+        if record is not None:
+            record.update(bytes=iflw_size, elements=stats['elements'], rows=len(flows))
+    return flows
+
+
+# Rows of the iflows this process has parsed, by fingerprint and configuration
+_parsed_iflows = collections.OrderedDict()
+
+
+def copy_flows(flows, uid, package_name):
+    rows = AdapterRows.copy_rows(flows, uid, package_name)
+    tables = getattr(flows, 'tables', None)
+    if tables is None:
+        return rows
+    return AdapterRows.RowBatch(rows, IflowArtifacts.copy_tables(tables, uid, package_name))
+
+
+def parse_once(key, fingerprint, package_name, uid, iflow, parse):
+    # Identical iflows (same .iflw, parameters.prop and manifest) are parsed once;
+    # every other copy gets the same rows under its own Package and UID
+    rows = _parsed_iflows.get(key)
+    if rows is not None:
+        _parsed_iflows.move_to_end(key)
+        with Profiling.stage('reuse_duplicate', package_name, iflow) as record:
+            flows = copy_flows(rows, uid, package_name)
+            if record is not None:
+                record['rows'] = len(flows)
+        return flows
+    flows = parse()
+    if flows:
+        flows[0].iflow.fingerprint = fingerprint
+    # A private copy, so that linking the returned rows does not leak into later copies
+    _parsed_iflows[key] = copy_flows(flows, uid, package_name)
+    if len(_parsed_iflows) > MAX_PARSED_IFLOWS:
+        _parsed_iflows.popitem(last=False)
+    return flows
+
+
+def process_inner_zip(zip_path, package_name, iflow_index, uid_prefix, streaming=False, resolver=None,
+                      overrides=None, config=(), artifacts=()):
+    iflow = os.path.basename(zip_path)
     extract_path = os.path.splitext(zip_path)[0]
-    unzip_file(zip_path, extract_path)
+    with Profiling.stage('unzip', package_name, iflow) as record:
+        unzip_file(zip_path, extract_path)
+        if record is not None:
+            record['bytes'] = os.path.getsize(zip_path)
+
+    with Profiling.stage('find_iflw', package_name, iflow):
+        iflw_file = find_iflw_file(extract_path)
+    with Profiling.stage('load_parameters', package_name, iflow):
+        params_data = read_file_bytes(Parameters.find_parameters_file(extract_path))
+        parameters = Parameters.LayeredParameters(Parameters.parse_properties_bytes(params_data), overrides)
+    with Profiling.stage('parse_manifest', package_name, iflow):
+        manifest_path = os.path.join(extract_path, 'META-INF', 'MANIFEST.MF')
+        manifest_data = read_file_bytes(manifest_path)
+        iflow_name, version, iflow_id = parse_manifest(manifest_path)
+    with Profiling.stage('fingerprint', package_name, iflow):
+        fingerprint = ExtractionCache.content_digest(read_file_bytes(iflw_file), params_data, manifest_data)
+
+    uid = f"{uid_prefix}-{iflow_index}"
+    return parse_once((fingerprint,) + tuple(config), fingerprint, package_name, uid, iflow,
+                      lambda: run_extractor(iflw_file, os.path.getsize(iflw_file), iflow_name, iflow_id, version,
+                                            parameters, package_name, uid, streaming, iflow, resolver, artifacts))
+
+
+def is_inner_zip_name(name):
+    # Same rule as prepare_inner_zips, applied to archive member names
+    base = posixpath.basename(name)
+    return base.endswith('.zip') or ('_' in base and '.' not in base)
+
+
+def open_text_member(zip_ref, name):
+    return io.TextIOWrapper(zip_ref.open(name), encoding='utf-8')
 
-    iflw_file = find_iflw_file(extract_path)
-    parameters = load_parameters(extract_path)
-    manifest_path = os.path.join(extract_path, 'META-INF', 'MANIFEST.MF')
-    iflow_name, version, iflow_id = parse_manifest(manifest_path)
+
+def process_inner_zip_bytes(data, package_name, iflow_index, uid_prefix, streaming=False, iflow=None,
+                            resolver=None, overrides=None, config=(), artifacts=()):
+    Profiling.mark('find_iflw')
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_ref:
+        names = zip_ref.namelist()
+        iflw_name = next((n for n in names if n.endswith('.iflw')), None)
+        if iflw_name is None:
+            raise FileNotFoundError("No .iflw file found in archive.")
+
+        with Profiling.stage('load_parameters', package_name, iflow):
+            params_data = b''
+            params_name = next((n for n in names if posixpath.basename(n) == 'parameters.prop'), None)
+            if params_name:
+                params_data = zip_ref.read(params_name)
+            parameters = Parameters.LayeredParameters(Parameters.parse_properties_bytes(params_data), overrides)
+
+        with Profiling.stage('parse_manifest', package_name, iflow):
+            manifest_data = b''
+            iflow_name = version = iflow_id = None
+            if 'META-INF/MANIFEST.MF' in names:
+                manifest_data = zip_ref.read('META-INF/MANIFEST.MF')
+                with io.TextIOWrapper(io.BytesIO(manifest_data), encoding='utf-8') as f:
+                    iflow_name, version, iflow_id = read_manifest(f)
+
+        with Profiling.stage('fingerprint', package_name, iflow):
+            iflw_data = zip_ref.read(iflw_name)
+            fingerprint = ExtractionCache.content_digest(iflw_data, params_data, manifest_data)
 
     uid = f"{uid_prefix}-{iflow_index}"
-    return extract_message_flows(iflw_file, iflow_name, iflow_id, version, parameters, package_name, uid)
+    return parse_once((fingerprint,) + tuple(config), fingerprint, package_name, uid, iflow,
+                      lambda: run_extractor(io.BytesIO(iflw_data), len(iflw_data), iflow_name, iflow_id, version,
+                                            parameters, package_name, uid, streaming, iflow, resolver, artifacts))
 
 
 def generate_short_id(length=7):
     return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(length))
 
 
-def main():
-    input_dir = '.'
-    output_uid = generate_short_id()
-    output_csv = f'automatic_asis_{output_uid}.csv'
-    all_flows = []
-    package_iflow_counter = {}
+def scan_package_on_disk(zip_path):
+    extract_dir = os.path.join(TEMP_DIR, generate_short_id())
+    with Profiling.stage('unzip') as unzip_record:
+        unzip_file(zip_path, extract_dir)
 
-    if os.path.exists(TEMP_DIR):
-        shutil.rmtree(TEMP_DIR)
-    os.makedirs(TEMP_DIR)
+    export_info_path = os.path.join(extract_dir, 'ExportInformation.info')
+    package_name = parse_package_name(export_info_path)
+    if unzip_record is not None:
+        unzip_record.update(package=package_name, bytes=os.path.getsize(zip_path))
 
-    zip_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.zip')]
-    if not zip_files:
-        print("❌ No zip files found.")
+    with Profiling.stage('prepare_inner_zips', package_name):
+        prepare_inner_zips(extract_dir)
+        inner_zips = sorted(
+            os.path.join(root, f)
+            for root, _, files in os.walk(extract_dir)
+            for f in files if f.endswith('.zip')
+        )
+    return package_name, inner_zips, extract_dir
+
+
+def source_name(zip_path):
+    if isinstance(zip_path, PackageBytes):
+        return zip_path.name
+    return os.path.basename(zip_path)
+
+
+def open_package_zip(zip_path):
+    if isinstance(zip_path, PackageBytes):
+        return zipfile.ZipFile(io.BytesIO(zip_path.data), 'r')
+    return zipfile.ZipFile(zip_path, 'r')
+
+
+def scan_package_in_memory(zip_path):
+    with Profiling.stage('read_directory') as record:
+        with open_package_zip(zip_path) as zip_ref:
+            names = zip_ref.namelist()
+            package_name = 'Unknown'
+            if 'ExportInformation.info' in names:
+                with open_text_member(zip_ref, 'ExportInformation.info') as f:
+                    package_name = read_package_name(f)
+            inner_zips = sorted((zip_path, n) for n in names if is_inner_zip_name(n))
+        if record is not None:
+            record['package'] = package_name
+    return package_name, inner_zips, None
+
+
+def error_info(e):
+    # (stage, exception type, message) of a failure in this process
+    return Profiling.last_stage(), type(e).__name__, str(e)
+
+
+def describe_error(error):
+    stage, exception, message = error
+    return f"{exception} during {stage}: {message}"
+
+
+def scan_package(zip_path, in_memory):
+    Profiling.mark('open_package')
+    try:
+        if in_memory or isinstance(zip_path, PackageBytes):
+            return scan_package_in_memory(zip_path), None
+        return scan_package_on_disk(zip_path), None
+    except Exception as e:
+        return None, error_info(e)
+
+
+# Worker processes keep the last package zip open, since consecutive tasks
+# usually come from the same package.
+_open_package = (None, None)
+
+
+def read_inner_zip_member(zip_path, member):
+    global _open_package
+    path, zip_ref = _open_package
+    if path != zip_path:
+        if zip_ref is not None:
+            zip_ref.close()
+        zip_ref = open_package_zip(zip_path)
+        _open_package = (zip_path, zip_ref)
+    return zip_ref.read(member)
+
+
+def close_open_package():
+    global _open_package
+    if _open_package[1] is not None:
+        _open_package[1].close()
+    _open_package = (None, None)
+
+
+def inner_zip_name(inner_ref):
+    if isinstance(inner_ref, tuple):
+        return posixpath.basename(inner_ref[1])
+    return os.path.basename(inner_ref)
+
+
+# settings -> (resolver, overrides, digest); the digest is only computed again when
+# a rule or parameter file was reloaded
+_config_versions = {}
+
+
+def config_version(rule_files=(), parameter_files=(), artifacts=()):
+    resolver = address_resolver(rule_files)
+    overrides = Parameters.load_overrides(tuple(parameter_files))
+    key = (tuple(rule_files), tuple(parameter_files), tuple(artifacts))
+    entry = _config_versions.get(key)
+    if entry is None or entry[0] is not resolver or entry[1] is not overrides:
+        version = ExtractionCache.config_digest({'address_rules': resolver.rules,
+                                                 'parameters': sorted(overrides.items()),
+                                                 'fields': list(AdapterRows.FIELD_PATHS),
+                                                 'artifacts': list(artifacts)})
+        entry = _config_versions[key] = (resolver, overrides, version)
+    return entry[2]
+
+
+def process_inner_ref(inner_ref, package_name, iflow_index, uid_prefix, options, data=None):
+    # Returns ((flows, digest, cached), error); digest is only set when caching and
+    # error is a (stage, exception type, message) tuple.
+    # `data` holds the inner zip bytes when the caller has already read them.
+    Profiling.mark('read_member')
+    try:
+        streaming = options.get('streaming', False)
+        cache_path = options.get('cache_path')
+        rule_files = options.get('adapter_rules', ())
+        parameter_files = options.get('parameter_files', ())
+        artifacts = options.get('artifacts', ())
+        iflow = inner_zip_name(inner_ref)
+        digest = None
+        if data is None and (isinstance(inner_ref, tuple) or cache_path):
+            with Profiling.stage('read_member', package_name, iflow) as record:
+                if isinstance(inner_ref, tuple):
+                    data = read_inner_zip_member(*inner_ref)
+                else:
+                    with open(inner_ref, 'rb') as f:
+                        data = f.read()
+                if record is not None:
+                    record['bytes'] = len(data)
+
+        if cache_path:
+            with Profiling.stage('cache_lookup', package_name, iflow):
+                digest = ExtractionCache.archive_digest(data)
+                rows = ExtractionCache.lookup_rows(cache_path, config_version(rule_files, parameter_files, artifacts),
+                                                   digest)
+            if rows is not None:
+                uid = f"{uid_prefix}-{iflow_index}"
+                return (ExtractionCache.restore_context(rows, package_name, uid), digest, True), None
+
+        resolver = address_resolver(rule_files)
+        overrides = Parameters.load_overrides(parameter_files)
+        # Duplicate iflows are only reused under the same settings
+        config = (config_version(rule_files, parameter_files, artifacts),)
+        if isinstance(inner_ref, tuple):
+            flows = process_inner_zip_bytes(data, package_name, iflow_index, uid_prefix, streaming, iflow, resolver,
+                                            overrides, config, artifacts)
+        else:
+            flows = process_inner_zip(inner_ref, package_name, iflow_index, uid_prefix, streaming, resolver,
+                                      overrides, config, artifacts)
+        return (flows, digest, False), None
+    except Exception as e:
+        return None, error_info(e)
+
+
+def ordered_map(executor, func, arg_tuples, window, profile=False):
+    # Lazy, order-preserving map that keeps at most `window` tasks in flight,
+    # so finished results never pile up faster than they are consumed.
+    if profile:
+        # Tasks also return the stage records of the process that ran them
+        for result in ordered_map(executor, Profiling.call, ((func, *args) for args in arg_tuples), window):
+            yield Profiling.merge(result)
         return
+    if executor is None:
+        for args in arg_tuples:
+            yield func(*args)
+        return
+    pending = collections.deque()
+    for args in arg_tuples:
+        pending.append(executor.submit(func, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def discover_zip_files(input_dir):
+    return sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.lower().endswith('.zip'))
+
+
+def discover_inputs(inputs):
+    # A directory stands for the zips it contains; files are taken as given
+    zip_paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            zip_paths.extend(discover_zip_files(path))
+        elif os.path.isfile(path):
+            zip_paths.append(path)
+        else:
+            raise FileNotFoundError(f"'{path}' not found.")
+    return list(dict.fromkeys(zip_paths))
+
+
+def remove_extract_dir(extract_dir, package_name):
+    with Profiling.stage('cleanup', package_name):
+        shutil.rmtree(extract_dir, ignore_errors=True)
+
+
+def report_package_error(zip_path, error, manifest=None, progress=print):
+    progress(f"❌ Error unzipping '{source_name(zip_path)}': {describe_error(error)}")
+    if manifest is not None:
+        manifest.package_error(zip_path, error)
+
 
+def iter_packages(zip_paths, in_memory, executor, window, profile=False, manifest=None, progress=print):
+    # Stage 1: open each package and list its inner zips
+    scans = ordered_map(executor, scan_package, ((zip_path, in_memory) for zip_path in zip_paths), window, profile)
+    for zip_path, (scan, error) in zip(zip_paths, scans):
+        if error:
+            report_package_error(zip_path, error, manifest, progress)
+            continue
+        yield zip_path, scan
+
+
+def iter_iflow_tasks(packages, options, package_iflow_counter=None, manifest=None, progress=print):
+    # Stage 2: number iflows in package order so UIDs match a serial run.
+    # Yields (zip_path, extract_dir, task).
+    if package_iflow_counter is None:
+        package_iflow_counter = {}
+    for zip_path, (package_name, inner_zips, extract_dir) in packages:
+        uid_prefix = generate_prefix_from_package(package_name)
+        package_iflow_counter.setdefault(uid_prefix, 0)
+        if manifest is not None:
+            manifest.start_package(zip_path, package_name, uid_prefix, len(inner_zips))
+        if not inner_zips:
+            progress(f"⚠️  No inner zip files found in '{source_name(zip_path)}'.")
+            if extract_dir:
+                remove_extract_dir(extract_dir, package_name)
+        for inner_ref in inner_zips:
+            package_iflow_counter[uid_prefix] += 1
+            yield zip_path, extract_dir, (inner_ref, package_name, package_iflow_counter[uid_prefix], uid_prefix,
+                                          options)
+
+
+def handle_result(result, error, inner_ref, cache, manifest=None, zip_path=None, progress=print):
+    # Reports one inner zip, keeps the cache and the run manifest up to date;
+    # returns its rows, or None on error
+    if manifest is not None:
+        manifest.add_result(zip_path, inner_zip_name(inner_ref), result and result[0], error)
+    if error:
+        progress(f"❌ Error processing inner zip '{inner_zip_name(inner_ref)}': {describe_error(error)}")
+        return None
+    flows, digest, cached = result
+    if cached:
+        cache.touch(digest)
+        progress(f"♻️  Reused cached inner zip '{inner_zip_name(inner_ref)}' with {len(flows)} adapters.")
+    else:
+        if cache is not None:
+            cache.store(digest, flows)
+        progress(f"✅ Processed inner zip '{inner_zip_name(inner_ref)}' with {len(flows)} adapters.")
+    return flows
+
+
+def close_cache(cache, progress=print):
+    if cache is not None:
+        evicted = cache.close()
+        progress(f"♻️  Cache: {cache.hits} reused, {cache.misses} parsed, {evicted} evicted.")
+
+
+def read_package(zip_path):
+    # Runs in a thread: the package is read in one request and its inner zips
+    # are taken from memory, so a network share is hit once per package
+    with Profiling.stage('read_package') as record:
+        if isinstance(zip_path, PackageBytes):
+            data = zip_path.data
+        else:
+            with open(zip_path, 'rb') as f:
+                data = f.read()
+        with zipfile.ZipFile(io.BytesIO(data)) as zip_ref:
+            names = zip_ref.namelist()
+            package_name = 'Unknown'
+            if 'ExportInformation.info' in names:
+                with open_text_member(zip_ref, 'ExportInformation.info') as f:
+                    package_name = read_package_name(f)
+            members = {n: zip_ref.read(n) for n in sorted(names) if is_inner_zip_name(n)}
+        if record is not None:
+            record.update(package=package_name, bytes=len(data))
+    return package_name, members
+
+
+class ByteBudget:
+    # Caps the package bytes held in memory. A package larger than the whole
+    # budget is still let through once nothing else is held.
+
+    def __init__(self, limit):
+        import asyncio
+        self.limit = limit
+        self.held = 0
+        self.condition = asyncio.Condition()
+
+    async def acquire(self, size):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.held == 0 or self.held + size <= self.limit)
+            self.held += size
+
+    async def release(self, size):
+        async with self.condition:
+            self.held -= size
+            self.condition.notify_all()
+
+
+async def prefetch_packages(zip_paths, threads, budget, loaded):
+    # Budget is taken in package order, so the package the consumer waits for
+    # can never be starved by packages behind it
+    import asyncio
+    loop = asyncio.get_running_loop()
+    for zip_path in zip_paths:
+        try:
+            size = len(zip_path.data) if isinstance(zip_path, PackageBytes) else os.path.getsize(zip_path)
+        except OSError:
+            size = 0    # read_package reports the error
+        await budget.acquire(size)
+        await loaded.put((zip_path, size, loop.run_in_executor(threads, read_package, zip_path)))
+    await loaded.put(None)
+
+
+async def async_package_flows(zip_paths, jobs, options, cache, profile, prefetch, prefetch_mb,
+                              package_iflow_counter=None, manifest=None, progress=print):
+    import asyncio
+    import concurrent.futures
+    loop = asyncio.get_running_loop()
+    budget = ByteBudget(prefetch_mb * 1024 * 1024)
+    loaded = asyncio.Queue(maxsize=prefetch)
+    if package_iflow_counter is None:
+        package_iflow_counter = {}
+    pending = collections.deque()    # (future, inner_ref, package entry) in UID order
+    window = jobs * 4
+
+    initializer = Profiling.enable if profile else None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=prefetch) as threads, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=initializer) as executor:
+        producer = asyncio.ensure_future(prefetch_packages(zip_paths, threads, budget, loaded))
+
+        async def finish_oldest():
+            future, inner_ref, entry = pending.popleft()
+            result = await future
+            if profile:
+                result = Profiling.merge(result)
+            # The package's bytes are released with its last inner zip
+            entry[0] -= 1
+            if not entry[0]:
+                await budget.release(entry[1])
+            return handle_result(*result, inner_ref, cache, manifest, inner_ref[0], progress)
+
+        try:
+            while True:
+                # While the next package is not ready, hand out finished results; this
+                # also frees budget when the prefetcher is waiting for it
+                while loaded.empty() and pending:
+                    flows = await finish_oldest()
+                    if flows is not None:
+                        yield flows
+                item = await loaded.get()
+                if item is None:
+                    break
+                zip_path, size, reading = item
+                try:
+                    package_name, members = await reading
+                except Exception as e:
+                    report_package_error(zip_path, ('read_package', type(e).__name__, str(e)), manifest, progress)
+                    await budget.release(size)
+                    continue
+
+                # Bytes packages are named by their label, so that tasks do not carry the whole package
+                label = zip_path.name if isinstance(zip_path, PackageBytes) else zip_path
+                refs = [(label, member) for member in members]
+                entry = [len(refs), size]
+                if not refs:
+                    await budget.release(size)
+                for _, _, task in iter_iflow_tasks([(zip_path, (package_name, refs, None))], options,
+                                                   package_iflow_counter, manifest, progress):
+                    if len(pending) >= window:
+                        flows = await finish_oldest()
+                        if flows is not None:
+                            yield flows
+                    data = members.pop(task[0][1])
+                    if profile:
+                        future = loop.run_in_executor(executor, Profiling.call, process_inner_ref, *task, data)
+                    else:
+                        future = loop.run_in_executor(executor, process_inner_ref, *task, data)
+                    pending.append((future, task[0], entry))
+
+            while pending:
+                flows = await finish_oldest()
+                if flows is not None:
+                    yield flows
+        finally:
+            producer.cancel()
+            for future, _, _ in pending:
+                future.cancel()
+
+
+def iter_package_flows_async(zip_paths, jobs, options, cache, profile=False, prefetch=DEFAULT_PREFETCH,
+                             prefetch_mb=DEFAULT_PREFETCH_MB, package_iflow_counter=None, manifest=None,
+                             progress=print):
+    # Drives the asyncio pipeline from synchronous code, one result at a time
+    import asyncio
+    loop = asyncio.new_event_loop()
+    results = async_package_flows(zip_paths, jobs, options, cache, profile, prefetch, prefetch_mb,
+                                  package_iflow_counter, manifest, progress)
     try:
-        for zip_file in zip_files:
-            zip_path = os.path.join(input_dir, zip_file)
-            short_id = generate_short_id()
-            extract_dir = os.path.join(TEMP_DIR, short_id)
+        while True:
             try:
-                unzip_file(zip_path, extract_dir)
+                yield loop.run_until_complete(results.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(results.aclose())
+        loop.close()
 
-                export_info_path = os.path.join(extract_dir, 'ExportInformation.info')
-                package_name = parse_package_name(export_info_path)
-                uid_prefix = generate_prefix_from_package(package_name)
 
-                package_iflow_counter.setdefault(uid_prefix, 0)
+def iter_package_flows(zip_paths, in_memory=False, jobs=1, streaming=False, cache_path=None,
+                       cache_max_age=ExtractionCache.DEFAULT_MAX_AGE, profile=False, adapter_rules=(),
+                       parameter_files=(), use_async=False, prefetch=DEFAULT_PREFETCH,
+                       prefetch_mb=DEFAULT_PREFETCH_MB, package_iflow_counter=None, manifest=None, artifacts=(),
+                       progress=print):
+    # Yields the adapter rows of each inner zip, in UID order, as soon as they are ready.
+    # A resumed run passes the UID counter of the packages it skipped; `manifest`
+    # (a RunManifest) is told about every package and inner zip result. With
+    # `artifacts` (IflowArtifacts table names), each batch is a RowBatch that also
+    # carries those step tables. `progress` is called with each progress line.
+    adapter_rules = tuple(adapter_rules)
+    parameter_files = tuple(parameter_files)
+    artifacts = tuple(artifacts)
+    options = {'streaming': streaming, 'cache_path': cache_path, 'adapter_rules': adapter_rules,
+               'parameter_files': parameter_files, 'artifacts': artifacts}
+    # Fails early on a broken rule or parameter file, before any worker is started
+    version = config_version(adapter_rules, parameter_files, artifacts)
+    cache = None
+    if cache_path:
+        cache = ExtractionCache.ExtractionCache(cache_path, version, cache_max_age)
+    jobs = jobs or os.cpu_count() or 1
+
+    if use_async:
+        try:
+            yield from iter_package_flows_async(zip_paths, jobs, options, cache, profile, prefetch, prefetch_mb,
+                                                package_iflow_counter, manifest, progress)
+        finally:
+            close_cache(cache, progress)
+        return
+
+    executor = None
+    if jobs > 1:
+        import concurrent.futures
+        initializer = Profiling.enable if profile else None
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=initializer)
+
+    # (zip_path, extract_dir, task) of tasks that were submitted and are waiting for their result
+    submitted = collections.deque()
+
+    def submit(source):
+        for zip_path, extract_dir, task in source:
+            if isinstance(zip_path, PackageBytes):
+                # The inner zip is read here and handed over, rather than the whole package
+                member = task[0][1]
+                task = ((zip_path.name, member), *task[1:], read_inner_zip_member(zip_path, member))
+            submitted.append((zip_path, extract_dir, task))
+            yield task
+
+    current_dir = current_package = None
+    try:
+        packages = iter_packages(zip_paths, in_memory, executor, jobs, profile, manifest, progress)
+        tasks = iter_iflow_tasks(packages, options, package_iflow_counter, manifest, progress)
+        results = ordered_map(executor, process_inner_ref, submit(tasks), jobs * 4, profile)
+
+        # Stage 3: extract rows, in task order
+        for result, error in results:
+            zip_path, extract_dir, (inner_ref, package_name, *_) = submitted.popleft()
+            # Once results move on to another package, its extracted files are no longer needed
+            if extract_dir != current_dir:
+                if current_dir is not None:
+                    remove_extract_dir(current_dir, current_package)
+                current_dir, current_package = extract_dir, package_name
+            flows = handle_result(result, error, inner_ref, cache, manifest, zip_path, progress)
+            if flows is not None:
+                yield flows
+    finally:
+        if current_dir is not None:
+            remove_extract_dir(current_dir, current_package)
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        close_open_package()
+        close_cache(cache, progress)
+
+
+def is_zip_member(zip_ref, info):
+    # Inner archives are recognised by their local file header signature, whatever their name
+    if info.is_dir() or info.file_size < len(ZIP_SIGNATURE):
+        return False
+    with zip_ref.open(info) as f:
+        return f.read(len(ZIP_SIGNATURE)) == ZIP_SIGNATURE
+
+
+def open_inner_archive(zip_ref, info):
+    # A stored member is read in place, so only its central directory and manifest
+    # are touched; a compressed one has to be inflated first
+    if info.compress_type == zipfile.ZIP_STORED:
+        return zipfile.ZipFile(zip_ref.open(info))
+    return zipfile.ZipFile(io.BytesIO(zip_ref.read(info)))
 
-                prepare_inner_zips(extract_dir)
-                inner_zips = [
-                    os.path.join(root, f)
-                    for root, _, files in os.walk(extract_dir)
-                    for f in files if f.endswith('.zip')
-                ]
-                if not inner_zips:
-                    print(f"⚠️  No inner zip files found in '{zip_file}'.")
 
-                for inner_zip in inner_zips:
+def inventory_package(zip_path):
+    # Package name and (inner zip, iflow name, version, ID) of every iflow, without
+    # extracting anything or parsing a single .iflw
+    Profiling.mark('inventory')
+    try:
+        with Profiling.stage('inventory') as record:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                package_name = 'Unknown'
+                if 'ExportInformation.info' in zip_ref.namelist():
+                    with open_text_member(zip_ref, 'ExportInformation.info') as f:
+                        package_name = read_package_name(f)
+                iflows = []
+                for info in sorted(zip_ref.infolist(), key=lambda info: info.filename):
+                    if not is_zip_member(zip_ref, info):
+                        continue
+                    # A damaged inner archive is still listed, so UIDs stay in line with a full run
+                    manifest = (None, None, None)
                     try:
-                        package_iflow_counter[uid_prefix] += 1
-                        index = package_iflow_counter[uid_prefix]
-                        flows = process_inner_zip(inner_zip, package_name, index, uid_prefix)
-                        all_flows.extend(flows)
-                        print(f"✅ Processed inner zip '{os.path.basename(inner_zip)}' with {len(flows)} adapters.")
-                    except Exception as e:
-                        print(f"❌ Error processing inner zip '{inner_zip}': {e}")
-            except Exception as e:
-                print(f"❌ Error unzipping '{zip_file}': {e}")
-
-        if all_flows:
-            save_to_csv(all_flows, output_csv)
-            print(f"✅ Saved {len(all_flows)} adapters into '{output_csv}'.")
-        else:
-            print("❌ No adapters found to save.")
+                        with open_inner_archive(zip_ref, info) as inner_ref:
+                            if 'META-INF/MANIFEST.MF' in inner_ref.namelist():
+                                with open_text_member(inner_ref, 'META-INF/MANIFEST.MF') as f:
+                                    manifest = read_manifest(f)
+                    except zipfile.BadZipFile:
+                        pass
+                    iflows.append((posixpath.basename(info.filename), *manifest))
+            if record is not None:
+                record.update(package=package_name, bytes=os.path.getsize(zip_path), rows=len(iflows))
+        return (package_name, iflows), None
+    except Exception as e:
+        return None, error_info(e)
+
+
+def iter_inventory(zip_paths, jobs=1, profile=False, progress=print):
+    # Yields the inventory rows of each package, numbered like a full extraction
+    jobs = jobs or os.cpu_count() or 1
+    executor = None
+    if jobs > 1:
+        import concurrent.futures
+        initializer = Profiling.enable if profile else None
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=initializer)
+    package_iflow_counter = {}
+    try:
+        results = ordered_map(executor, inventory_package, ((zip_path,) for zip_path in zip_paths), jobs * 4,
+                              profile)
+        for zip_path, (result, error) in zip(zip_paths, results):
+            if error:
+                progress(f"❌ Error reading '{os.path.basename(zip_path)}': {describe_error(error)}")
+                continue
+            package_name, iflows = result
+            uid_prefix = generate_prefix_from_package(package_name)
+            rows = []
+            for _, iflow_name, version, iflow_id in iflows:
+                package_iflow_counter[uid_prefix] = package_iflow_counter.get(uid_prefix, 0) + 1
+                rows.append({'UID': f"{uid_prefix}-{package_iflow_counter[uid_prefix]}", 'Package': package_name,
+                             'Iflow': iflow_name, 'IflowID': iflow_id, 'IflowVersion': version})
+            progress(f"📦 Listed {len(rows)} iflows in '{os.path.basename(zip_path)}'.")
+            yield rows
     finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def extract_packages(zip_paths, **options):
+    all_flows = []
+    for flows in iter_package_flows(zip_paths, **options):
+        all_flows.extend(flows)
+    return all_flows
+
+
+def int_at_least(minimum):
+    def parse(text):
+        import argparse
+        value = int(text)
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {value}")
+        return value
+    parse.__name__ = 'integer'
+    return parse
+
+
+def parse_args(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Extract adapter metadata from SAP Integration Suite package exports.")
+    parser.add_argument('inputs', nargs='*', default=['.'], metavar='PATH',
+                        help="package zips, or directories whose zips are read (default: the current directory)")
+    parser.add_argument('--output', metavar='BASE',
+                        help="output file name without extension (default: automatic_asis_<random id>)")
+    parser.add_argument('--in-memory', action='store_true',
+                        help="read archives in memory instead of extracting them into the temp directory")
+    parser.add_argument('--jobs', type=int_at_least(0), default=1, metavar='N',
+                        help="number of worker processes (0 uses every CPU, default 1)")
+    parser.add_argument('--async', action='store_true', dest='use_async',
+                        help="prefetch package zips in threads while worker processes parse (reads in memory)")
+    parser.add_argument('--prefetch', type=int_at_least(1), default=DEFAULT_PREFETCH, metavar='N',
+                        help=f"with --async, package zips read ahead concurrently (default {DEFAULT_PREFETCH})")
+    parser.add_argument('--prefetch-mb', type=int_at_least(1), default=DEFAULT_PREFETCH_MB, metavar='MB',
+                        help=f"with --async, cap on package bytes held in memory (default {DEFAULT_PREFETCH_MB})")
+    parser.add_argument('--iterparse', action='store_true',
+                        help="parse .iflw files incrementally with the streaming extractor")
+    parser.add_argument('--cache', nargs='?', const=ExtractionCache.CACHE_FILE, metavar='PATH',
+                        help=f"reuse rows of unchanged iflows from a SQLite cache (default file: {ExtractionCache.CACHE_FILE})")
+    parser.add_argument('--cache-max-age', type=int, default=ExtractionCache.DEFAULT_MAX_AGE, metavar='N',
+                        help="evict cache entries not used in the last N runs")
+    parser.add_argument('--adapter-rules', action='append', default=[], metavar='FILE',
+                        help="JSON file with extra address rules per adapter type, may be repeated")
+    parser.add_argument('--parameters', action='append', default=[], metavar='FILE', dest='parameter_files',
+                        help="environment .prop file whose values override parameters.prop, may be repeated")
+    parser.add_argument('--parameter-stats', action='store_true',
+                        help="add the ResolvedParameters/UnresolvedParameters/ParameterSources columns")
+    parser.add_argument('--artifacts', nargs='*', choices=list(IflowArtifacts.EXTRACTORS), metavar='TABLE',
+                        help="also extract process steps into one table per artifact type, in the same pass "
+                             f"(default: all of {', '.join(IflowArtifacts.EXTRACTORS)})")
+    parser.add_argument('--link', action='store_true',
+                        help="add the ProcessDirect CallsIflow/IsCalledByIflow columns from InternalCalls")
+    parser.add_argument('--graph', metavar='FILE',
+                        help="export the iflow call graph as .graphml, .dot or .json")
+    parser.add_argument('--format', action='append', choices=sorted(OutputWriters.WRITERS), dest='formats',
+                        help="output format, may be repeated (default csv; parquet and arrow need pyarrow)")
+    parser.add_argument('--catalog', nargs='?', const=CATALOG_FILE, metavar='PATH',
+                        help=f"also upsert the rows into a SQLite catalog (default file: {CATALOG_FILE})")
+    parser.add_argument('--endpoints', nargs='?', const=ENDPOINTS_FILE, metavar='PATH',
+                        help=f"also save an endpoint index for host and path lookups "
+                             f"(default file: {ENDPOINTS_FILE})")
+    parser.add_argument('--report', action='store_true',
+                        help="also write a landscape report (adapter types, parametrization, versions, shared "
+                             "endpoints) as <output>_report.json and .html")
+    parser.add_argument('--watch', nargs='?', type=float, const=DEFAULT_WATCH_INTERVAL, metavar='SECONDS',
+                        help=f"keep polling the directory and add new or changed zips to the catalog "
+                             f"(default every {DEFAULT_WATCH_INTERVAL:g}s)")
+    parser.add_argument('--resume', nargs='?', const='', metavar='CHECKPOINT',
+                        help="continue an interrupted run from its checkpoint file (default: the newest one)")
+    parser.add_argument('--inventory', action='store_true',
+                        help="only list packages and iflows (name, ID, version) from the zip directories and "
+                             "manifests, without adapter details")
+    parser.add_argument('--profile', action='store_true',
+                        help="write a JSON report with wall/CPU time, bytes and element counts per stage")
+    parser.add_argument('--profile-dump', metavar='FILE',
+                        help="write cProfile statistics of the main process to FILE (pstats format)")
+    return parser.parse_args(argv)
+
+
+def write_tables(batches, table_writers):
+    # Writes the step tables each batch carries, then passes its adapter rows on
+    for flows in batches:
+        tables = getattr(flows, 'tables', None)
+        if tables:
+            with Profiling.stage('write_tables'):
+                for name, rows in tables.items():
+                    for writer in table_writers.get(name, ()):
+                        writer.write_rows(rows)
+        yield flows
+
+
+def run_extraction(args, zip_paths, output_base, finished=()):
+    # Packages recorded in `finished` (from a checkpoint) are replayed instead of extracted
+    manifest = RunManifest.RunManifest(output_base, finished)
+    completed = False
+    try:
+        write_outputs(args, zip_paths, output_base, finished, manifest)
+        completed = True
+    finally:
+        manifest.close(completed)
+        if manifest.errors:
+            print(f"⚠️  {len(manifest.errors)} errors, see '{manifest.errors_path}'.")
+        if not completed:
+            print(f"💾 Progress saved in '{manifest.path}'; run again with --resume to continue.")
+
+
+def write_outputs(args, zip_paths, output_base, finished, manifest):
+    batches = iter_package_flows(zip_paths[len(finished):], in_memory=args.in_memory, jobs=args.jobs,
+                                 streaming=args.iterparse, cache_path=args.cache, cache_max_age=args.cache_max_age,
+                                 profile=args.profile, adapter_rules=args.adapter_rules,
+                                 parameter_files=args.parameter_files, use_async=args.use_async,
+                                 prefetch=args.prefetch, prefetch_mb=args.prefetch_mb,
+                                 package_iflow_counter=RunManifest.restore_counter(finished), manifest=manifest,
+                                 artifacts=args.artifacts)
+    if finished:
+        batches = itertools.chain(RunManifest.replay_rows(finished), batches)
+
+    fieldnames = FIELDNAMES + PARAMETER_FIELDNAMES if args.parameter_stats else FIELDNAMES
+    if args.link:
+        fieldnames = fieldnames + LINK_FIELDNAMES
+    formats = args.formats or ['csv']
+    writers = [OutputWriters.open_writer(fmt, output_base, fieldnames) for fmt in formats]
+    if args.catalog:
+        import Catalog
+        writers.append(Catalog.CatalogWriter(args.catalog))
+    if args.endpoints:
+        import EndpointIndex
+        writers.append(EndpointIndex.IndexWriter(args.endpoints))
+    if args.report:
+        import LandscapeReport
+        writers.append(LandscapeReport.ReportWriter(f'{output_base}_report.html', name=os.path.basename(output_base)))
+    table_writers = {name: [OutputWriters.open_writer(fmt, f'{output_base}_{name}',
+                                                      IflowArtifacts.EXTRACTORS[name].fieldnames(),
+                                                      IflowArtifacts.EXTRACTORS[name].field_types)
+                            for fmt in formats]
+                     for name in args.artifacts}
+    if table_writers:
+        batches = write_tables(batches, table_writers)
+
+    all_flows = None
+    try:
+        # Linking and the call graph need every row; otherwise rows are written as they arrive
+        if args.link or args.graph:
+            all_flows = [flow for flows in batches for flow in flows]
+            batches = [all_flows]
+            if args.link:
+                with Profiling.stage('link'):
+                    InternalCalls.link_flows(all_flows)
+
+        for flows in batches:
+            with Profiling.stage('write') as record:
+                for writer in writers:
+                    writer.write_rows(flows)
+                if record is not None:
+                    record['rows'] = len(flows)
+    finally:
+        for writer in writers + [writer for group in table_writers.values() for writer in group]:
+            writer.close()
+
+    for name, group in table_writers.items():
+        for writer in group:
+            if writer.rows_written:
+                print(f"✅ Saved {writer.rows_written} {name.replace('_', ' ')} into '{writer.output_path}'.")
+    if writers[0].rows_written:
+        for writer in writers:
+            # The endpoint index reports its endpoints, the landscape report both of its files
+            summary = getattr(writer, 'summary', None)
+            print(summary() if summary else f"✅ Saved {writer.rows_written} adapters into '{writer.output_path}'.")
+        if args.graph:
+            import CallGraph
+            with Profiling.stage('graph'):
+                CallGraph.CallGraph.from_rows(all_flows).export(args.graph)
+            print(f"✅ Exported call graph to '{args.graph}'.")
+    else:
+        print("❌ No adapters found to save.")
+
+
+def run_inventory(args, zip_paths, output_base):
+    writers = [OutputWriters.open_writer(fmt, f'{output_base}_inventory', INVENTORY_FIELDNAMES)
+               for fmt in args.formats or ['csv']]
+    try:
+        for rows in iter_inventory(zip_paths, args.jobs, args.profile):
+            with Profiling.stage('write') as record:
+                for writer in writers:
+                    writer.write_rows(rows)
+                if record is not None:
+                    record['rows'] = len(rows)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    if writers[0].rows_written:
+        for writer in writers:
+            print(f"✅ Saved {writer.rows_written} iflows into '{writer.output_path}'.")
+    else:
+        print("❌ No iflows found to save.")
+
+
+def stat_key(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def watch_once(args, input_dir, catalog_path, previous):
+    # A zip is only picked up once its size and mtime are stable, so files that are
+    # still being copied into the directory are left for the next poll
+    import Catalog
+    current = {}
+    for path in discover_zip_files(input_dir):
+        try:
+            current[os.path.abspath(path)] = stat_key(path)
+        except OSError:
+            continue
+    settled = time.time() - args.watch
+    ready = {path: stat for path, stat in current.items()
+             if previous.get(path) == stat or stat[1] / 1e9 <= settled}
+
+    writer = Catalog.CatalogWriter(catalog_path)
+    try:
+        addresses = set()
+        iflow_refs = set()
+        for path, digest in list(writer.changed_sources(ready)):
+            if not zipfile.is_zipfile(path):
+                print(f"⚠️  Skipping '{os.path.basename(path)}': not a complete zip file yet.")
+                continue
+            print(f"📦 Processing '{os.path.basename(path)}'...")
+            rows = extract_packages([path], in_memory=True, jobs=args.jobs, streaming=args.iterparse,
+                                    cache_path=args.cache, cache_max_age=args.cache_max_age,
+                                    adapter_rules=args.adapter_rules, parameter_files=args.parameter_files)
+            changed_addresses, refs = writer.update_source(path, ready[path], digest, rows)
+            addresses |= changed_addresses
+            iflow_refs |= refs
+            print(f"✅ Upserted {len(rows)} adapters from '{os.path.basename(path)}' into '{catalog_path}'.")
+        if iflow_refs:
+            relinked = writer.relink(addresses, iflow_refs)
+            print(f"🔗 Re-linked {relinked} iflows.")
+    finally:
+        writer.close()
+    return current
+
+
+def watch(args, input_dir):
+    catalog_path = args.catalog or CATALOG_FILE
+    print(f"👀 Watching '{os.path.abspath(input_dir)}' every {args.watch:g}s (catalog '{catalog_path}'). "
+          f"Press Ctrl+C to stop.")
+    seen = {}
+    try:
+        while True:
+            seen = watch_once(args, input_dir, catalog_path, seen)
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        print("✅ Stopped watching.")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # A bare --artifacts asks for every table
+    if args.artifacts is None:
+        args.artifacts = ()
+    else:
+        args.artifacts = tuple(dict.fromkeys(args.artifacts or IflowArtifacts.EXTRACTORS))
+    output_base = args.output or f'automatic_asis_{generate_short_id()}'
+
+    try:
+        address_resolver(args.adapter_rules)
+    except (OSError, ValueError) as e:
+        print(f"❌ Invalid adapter rules: {e}")
+        return
+    try:
+        Parameters.load_overrides(tuple(args.parameter_files))
+    except (OSError, ValueError) as e:
+        print(f"❌ Invalid parameter file: {e}")
+        return
+
+    if args.watch is not None:
+        if len(args.inputs) != 1 or not os.path.isdir(args.inputs[0]):
+            print("❌ --watch needs a single directory.")
+            return
+        watch(args, args.inputs[0])
+        return
+
+    try:
+        zip_paths = discover_inputs(args.inputs)
+    except OSError as e:
+        print(f"❌ {e}")
+        return
+    if not zip_paths:
+        print("❌ No zip files found.")
+        return
+
+    finished = ()
+    if args.resume is not None:
+        checkpoint = args.resume or RunManifest.find_checkpoint(os.path.dirname(output_base) or '.', args.output)
+        if checkpoint is None:
+            print("⚠️  No checkpoint found, starting a new run.")
+        elif not checkpoint.endswith(RunManifest.CHECKPOINT_SUFFIX) or not os.path.isfile(checkpoint):
+            print(f"❌ '{checkpoint}' is not a checkpoint file.")
+            return
+        else:
+            output_base = RunManifest.output_base_of(checkpoint)
+            finished = RunManifest.finished_prefix(RunManifest.load_records(checkpoint), zip_paths)
+            print(f"💾 Resuming from '{checkpoint}': {len(finished)} of {len(zip_paths)} packages already done.")
+
+    # The asyncio driver always reads archives in memory
+    args.in_memory = args.in_memory or args.use_async
+    if not args.in_memory and not args.inventory:
         if os.path.exists(TEMP_DIR):
             shutil.rmtree(TEMP_DIR)
+        os.makedirs(TEMP_DIR)
+
+    profiler = None
+    if args.profile_dump:
+        import cProfile
+        profiler = cProfile.Profile()
+    if args.profile:
+        Profiling.enable()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        if args.inventory:
+            run_inventory(args, zip_paths, output_base)
+        else:
+            run_extraction(args, zip_paths, output_base, finished)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile_dump)
+            print(f"✅ Saved cProfile statistics into '{args.profile_dump}'.")
+        if args.profile:
+            report = Profiling.build_report(Profiling.collect(), time.perf_counter() - wall,
+                                            time.process_time() - cpu, vars(args))
+            Profiling.write_report(report, f'{output_base}_profile.json')
+            Profiling.disable()
+            print(f"✅ Saved run profile into '{output_base}_profile.json'.")
+        if not args.in_memory and not args.inventory and os.path.exists(TEMP_DIR):
+            shutil.rmtree(TEMP_DIR)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,362 @@
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import zipfile
+from xml.sax.saxutils import escape
+
+import AutomaticASIS
+import InternalCalls
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Adapter type -> (direction, address key, address template, transport protocol)
+ADAPTER_TEMPLATES = {
+    'HTTPS': ('Sender', 'urlPath', '/{area}/v1/{name}', 'HTTPS'),
+    'HTTP': ('Receiver', 'httpAddressWithoutQuery', 'https://{host}/http/{area}/{name}', 'HTTP'),
+    'SOAP': ('Receiver', 'address', 'https://{host}/sap/bc/srt/{area}/{name}', 'HTTP'),
+    'HCIOData': ('Receiver', 'address', 'https://{host}/odata/v2/{name}', 'HTTP'),
+    'SFTP': ('Receiver', 'host', 'sftp.{area}.example.com', 'SFTP'),
+    'PollingSFTP': ('Sender', 'host', 'sftp.{area}.example.com', 'SFTP'),
+    'ProcessDirect': (None, 'address', '/{area}/{name}', 'Not Applicable'),
+    'JMS': (None, None, '{area}_{name}_queue', 'Not Applicable'),
+    'JDBC': ('Receiver', 'alias', '{area}_{name}_db', 'JDBC'),
+    'Mail': ('Receiver', 'mailUrl', 'smtp.{area}.example.com:587', 'SMTP'),
+}
+DEFAULT_ADAPTER_MIX = 'HTTPS=4,HTTP=3,ProcessDirect=3,JMS=2,SOAP=2,SFTP=1,PollingSFTP=1,HCIOData=1,JDBC=1,Mail=1'
+AREAS = ['orders', 'customers', 'invoices', 'materials', 'payments', 'shipments', 'employees', 'leads']
+# Fixed timestamp so the same seed always produces byte-identical archives
+ZIP_DATE_TIME = (2024, 1, 1, 0, 0, 0)
+
+
+def parse_adapter_mix(spec):
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ADAPTER_TEMPLATES:
+            raise ValueError(f"Unknown adapter type in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def property_xml(key, value):
+    return f'<ifl:property><key>{escape(key)}</key><value>{escape(value)}</value></ifl:property>'
+
+
+def manifest_text(name, version, symbolic_name):
+    lines = ['Manifest-Version: 1.0', f'Bundle-Name: {name}', f'Bundle-Version: {version}',
+             f'Origin-Bundle-SymbolicName: {symbolic_name}', 'Bundle-ManifestVersion: 2']
+    wrapped = []
+    # MANIFEST.MF lines are wrapped at 72 bytes with a leading space on continuations
+    for line in lines:
+        wrapped.append(line[:72])
+        for start in range(72, len(line), 71):
+            wrapped.append(' ' + line[start:start + 71])
+    return '\r\n'.join(wrapped) + '\r\n'
+
+
+def generate_iflow(rng, iflow_name, config):
+    adapter_types = list(config['adapter_mix'])
+    weights = list(config['adapter_mix'].values())
+    parameters = {}
+    flows = []
+    for index in range(config['flows']):
+        ctype = rng.choices(adapter_types, weights)[0]
+        direction, key, template, transport = ADAPTER_TEMPLATES[ctype]
+        direction = direction or rng.choice(['Sender', 'Receiver'])
+        if ctype == 'JMS':
+            key = 'QueueName_inbound' if direction == 'Sender' else 'QueueName_outbound'
+        address = template.format(host=f'{rng.choice(AREAS)}.example.com', area=rng.choice(AREAS),
+                                  name=f'{iflow_name.lower().replace(" ", "_")}_{index}')
+        if rng.random() < config['param_density']:
+            param = f'{ctype}_{index}_address'
+            # A few placeholders are left without a value, as happens in real exports
+            if rng.random() > 0.1:
+                parameters[param] = address
+            address = '{{' + param + '}}'
+        properties = [
+            ('ComponentType', ctype), ('direction', direction), ('Name', f'{ctype}_{index}'),
+            ('TransportProtocol', transport), ('componentVersion', f'1.{rng.randint(0, 15)}'),
+            ('ComponentNS', 'sap'), ('MessageProtocol', 'None'), (key, address),
+        ]
+        flows.append(
+            f'<bpmn2:messageFlow id="MessageFlow_{index}" name="{ctype}" sourceRef="Participant_{index}" '
+            f'targetRef="StartEvent_{index}"><bpmn2:extensionElements>'
+            + ''.join(property_xml(k, v) for k, v in properties)
+            + '</bpmn2:extensionElements></bpmn2:messageFlow>'
+        )
+
+    # Unrelated externalized parameters
+    for index in range(int(config['flows'] * config['param_density'])):
+        parameters[f'extra_param_{index}'] = f'value_{index}'
+
+    steps = []
+    size = sum(len(flow) for flow in flows)
+    step = 0
+    while size < config['iflw_kb'] * 1024:
+        script = f'// generated step {step}\n' + 'def x = message.getBody(String);\n' * 40
+        steps.append(
+            f'<bpmn2:callActivity id="CallActivity_{step}" name="Script {step}"><bpmn2:extensionElements>'
+            + property_xml('activityType', 'Script') + property_xml('script', f'script{step}.groovy')
+            + property_xml('scriptBody', script)
+            + '</bpmn2:extensionElements></bpmn2:callActivity>'
+        )
+        size += len(steps[-1])
+        step += 1
+
+    iflw = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<bpmn2:definitions xmlns:bpmn2="http://www.omg.org/spec/BPMN/20100524/MODEL" '
+        'xmlns:ifl="http:///com.sap.ifl.model/Ifl.xsd" id="Definitions_1">'
+        '<bpmn2:collaboration id="Collaboration_1" name="Default Collaboration">'
+        + ''.join(flows)
+        + '</bpmn2:collaboration><bpmn2:process id="Process_1" name="Integration Process">'
+        + ''.join(steps)
+        + '</bpmn2:process></bpmn2:definitions>'
+    )
+    prop_lines = ['#Generated parameters'] + [f'{k}={v}' for k, v in parameters.items()]
+    return iflw, '\n'.join(prop_lines) + '\n'
+
+
+def write_member(zip_ref, name, data):
+    zip_ref.writestr(zipfile.ZipInfo(name, ZIP_DATE_TIME), data, compress_type=zipfile.ZIP_DEFLATED)
+
+
+def generate_iflow_zip(rng, iflow_name, iflow_id, config):
+    iflw, parameters = generate_iflow(rng, iflow_name, config)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        write_member(zip_ref, 'META-INF/MANIFEST.MF', manifest_text(iflow_name, f'1.0.{rng.randint(0, 9)}', iflow_id))
+        write_member(zip_ref, 'src/main/resources/parameters.prop', parameters)
+        write_member(zip_ref, 'src/main/resources/parameters.propdef', '<parameters/>')
+        write_member(zip_ref, f'src/main/resources/scenarioflows/integrationflow/{iflow_id}.iflw', iflw)
+        write_member(zip_ref, 'src/main/resources/script/script1.groovy', 'import com.sap.gateway.ip.core.customdev.util.Message\n')
+        write_member(zip_ref, 'metainfo.prop', f'description={iflow_name}\n')
+    return buffer.getvalue()
+
+
+def generate_packages(output_dir, packages=5, iflows=10, flows=6, adapter_mix=DEFAULT_ADAPTER_MIX,
+                      param_density=0.5, iflw_kb=50, seed=42):
+    rng = random.Random(seed)
+    config = {'flows': flows, 'adapter_mix': parse_adapter_mix(adapter_mix),
+              'param_density': param_density, 'iflw_kb': iflw_kb}
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for package_index in range(packages):
+        package_name = f'Benchmark {rng.choice(AREAS).title()} Integration Package {package_index}'
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+            write_member(zip_ref, 'ExportInformation.info', f'Version=1.0\nName={package_name}\n')
+            write_member(zip_ref, 'contentmetadata.md', f'{package_name}\n')
+            write_member(zip_ref, 'resources.cnt', '')
+            for iflow_index in range(iflows):
+                iflow_name = f'Iflow {package_index}-{iflow_index}'
+                iflow_id = f'Benchmark_{package_index}_{iflow_index}'
+                artifact = uuid.UUID(int=rng.getrandbits(128)).hex
+                write_member(zip_ref, f'{artifact}_content', generate_iflow_zip(rng, iflow_name, iflow_id, config))
+        path = os.path.join(output_dir, f'benchmark_package_{package_index}.zip')
+        with open(path, 'wb') as f:
+            f.write(buffer.getvalue())
+        paths.append(path)
+    return paths
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def timed(results, stage, func, items_of=len, bytes_count=None):
+    start = time.perf_counter()
+    value = func()
+    seconds = time.perf_counter() - start
+    items = items_of(value)
+    entry = {'seconds': round(seconds, 6), 'items': items,
+             'items_per_second': round(items / seconds, 2) if seconds else None,
+             'peak_rss_kb': peak_rss_kb()}
+    if bytes_count is not None:
+        entry['bytes'] = bytes_count
+        entry['mb_per_second'] = round(bytes_count / seconds / 1e6, 3) if seconds else None
+    results[stage] = entry
+    return value
+
+
+def run_stages(zip_paths, work_dir):
+    results = {}
+    archive_bytes = sum(os.path.getsize(p) for p in zip_paths)
+
+    # unzip: the on-disk extraction main() does by default
+    def unzip():
+        inner_dirs = []
+        for zip_path in zip_paths:
+            extract_dir = os.path.join(work_dir, os.path.splitext(os.path.basename(zip_path))[0])
+            AutomaticASIS.unzip_file(zip_path, extract_dir)
+            AutomaticASIS.prepare_inner_zips(extract_dir)
+            for root, _, files in os.walk(extract_dir):
+                for f in files:
+                    if f.endswith('.zip'):
+                        inner_zip = os.path.join(root, f)
+                        AutomaticASIS.unzip_file(inner_zip, os.path.splitext(inner_zip)[0])
+                        inner_dirs.append(os.path.splitext(inner_zip)[0])
+        return inner_dirs
+
+    inner_dirs = timed(results, 'unzip', unzip, bytes_count=archive_bytes)
+    iflw_files = [AutomaticASIS.find_iflw_file(d) for d in inner_dirs]
+    iflw_bytes = sum(os.path.getsize(p) for p in iflw_files)
+
+    # parse: message flow extraction without parameters
+    def parse():
+        resolver = AutomaticASIS.address_resolver()
+        return [
+            (AutomaticASIS.extract_message_flows(path, 'Iflow', 'ID', '1.0.0', {}, 'Package', f'BM-{i}',
+                                                 resolver=resolver), d)
+            for i, (path, d) in enumerate(zip(iflw_files, inner_dirs), 1)
+        ]
+
+    parsed = timed(results, 'parse', parse, items_of=lambda v: sum(len(flows) for flows, _ in v),
+                   bytes_count=iflw_bytes)
+
+    # params: load parameters.prop and substitute placeholders in every address
+    def params():
+        rows = []
+        for flows, inner_dir in parsed:
+            parameters = AutomaticASIS.load_parameters(inner_dir)
+            for flow in flows:
+                row = dict(flow)
+                if row['AdapterAddress']:
+                    row['AdapterAddress'], parametrized = AutomaticASIS.substitute_parameters(
+                        row['AdapterAddress'], parameters)
+                    row['IsParametrized'] = row['IsParametrized'] or parametrized
+                rows.append(row)
+        return rows
+
+    rows = timed(results, 'params', params)
+
+    csv_path = os.path.join(work_dir, 'benchmark.csv')
+    timed(results, 'csv_write', lambda: AutomaticASIS.save_to_csv(rows, csv_path) or rows)
+    results['csv_write']['bytes'] = os.path.getsize(csv_path)
+
+    timed(results, 'link', lambda: InternalCalls.link_flows([dict(row) for row in rows]))
+    return results
+
+
+def run_end_to_end(zip_paths, jobs, in_memory):
+    results = {}
+    stage = f"end_to_end{'_in_memory' if in_memory else ''}_jobs{jobs}"
+    zip_paths = [os.path.abspath(p) for p in zip_paths]
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='asis_e2e_')
+    os.chdir(work_dir)
+    os.makedirs(AutomaticASIS.TEMP_DIR)
+    try:
+        # Progress lines are silenced so they don't dominate the timing
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w', encoding='utf-8')
+        try:
+            timed(results, stage,
+                  lambda: AutomaticASIS.extract_packages(zip_paths, in_memory=in_memory, jobs=jobs),
+                  bytes_count=sum(os.path.getsize(p) for p in zip_paths))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def add_generator_arguments(parser):
+    parser.add_argument('--packages', type=int, default=5, help="number of package zips (default 5)")
+    parser.add_argument('--iflows', type=int, default=10, help="iflows per package (default 10)")
+    parser.add_argument('--flows', type=int, default=6, help="message flows per iflow (default 6)")
+    parser.add_argument('--adapter-mix', default=DEFAULT_ADAPTER_MIX,
+                        help="weighted adapter types, e.g. 'HTTPS=3,JMS=1'")
+    parser.add_argument('--param-density', type=float, default=0.5,
+                        help="share of addresses that use {{parameters}} (default 0.5)")
+    parser.add_argument('--iflw-kb', type=int, default=50, help="approximate size of each .iflw in KB (default 50)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (default 42)")
+
+
+def generator_options(args):
+    return {'packages': args.packages, 'iflows': args.iflows, 'flows': args.flows, 'adapter_mix': args.adapter_mix,
+            'param_density': args.param_density, 'iflw_kb': args.iflw_kb, 'seed': args.seed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic packages and benchmark the extraction stages.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', help="write synthetic package zips into a directory")
+    generate.add_argument('output_dir')
+    add_generator_arguments(generate)
+
+    run = subparsers.add_parser('run', help="time each stage and print a JSON report")
+    run.add_argument('--input', metavar='DIR', help="benchmark existing package zips instead of generating them")
+    run.add_argument('--output', metavar='FILE', help="write the JSON report to FILE instead of stdout")
+    run.add_argument('--jobs', type=int, action='append', metavar='N',
+                     help="also time the full pipeline with N worker processes (may be repeated)")
+    add_generator_arguments(run)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        paths = generate_packages(args.output_dir, **generator_options(args))
+        print(f"✅ Generated {len(paths)} packages in '{args.output_dir}'.")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='asis_bench_')
+    try:
+        if args.input:
+            zip_paths = sorted(os.path.join(args.input, f) for f in os.listdir(args.input) if f.lower().endswith('.zip'))
+            corpus = {'input': args.input}
+        else:
+            zip_paths = generate_packages(os.path.join(work_dir, 'input'), **generator_options(args))
+            corpus = generator_options(args)
+
+        stages = run_stages(zip_paths, os.path.join(work_dir, 'extract'))
+        for jobs in args.jobs or []:
+            stages.update(run_end_to_end(zip_paths, jobs, in_memory=False))
+            stages.update(run_end_to_end(zip_paths, jobs, in_memory=True))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus,
+        'stages': stages,
+    }
+    content = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(content + '\n')
+        print(f"✅ Saved benchmark report into '{args.output}'.")
+    else:
+        print(content)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+import argparse
+import csv
+import json
+import os
+from urllib.parse import urlsplit
+from xml.sax.saxutils import escape, quoteattr
+
+from InternalCalls import normalize_address
+
+
+def http_path(address):
+    # HTTP receivers call other iflows through https://<tenant>/http/<urlPath>
+    path = urlsplit(address.strip()).path if '://' in address else address
+    if path.lower().startswith('/http/'):
+        path = path[5:]
+    return normalize_address(path)
+
+
+# Protocol -> (caller adapter types, callee adapter types, caller key, callee key).
+# Edges point from the iflow that sends the message (its Receiver adapter) to
+# the iflow that receives it (its Sender adapter).
+EDGE_RULES = {
+    'ProcessDirect': (('ProcessDirect',), ('ProcessDirect',), normalize_address, normalize_address),
+    'JMS': (('JMS',), ('JMS',), normalize_address, normalize_address),
+    'HTTPS': (('HTTP', 'HTTPS'), ('HTTPS',), http_path, normalize_address),
+}
+
+NODE_FIELDS = ('Iflow', 'IflowID', 'Package')
+
+
+class CallGraph:
+    def __init__(self):
+        self.nodes = {}          # UID -> node attributes
+        self.successors = {}     # UID -> {UID: [(protocol, address)]}
+        self.predecessors = {}   # UID -> {UID: [(protocol, address)]}
+
+    @classmethod
+    def from_rows(cls, rows):
+        graph = cls()
+        callers = {protocol: {} for protocol in EDGE_RULES}
+        callees = {protocol: {} for protocol in EDGE_RULES}
+
+        # Step 1: Register nodes and bucket adapters by protocol and match key
+        for row in rows:
+            uid = row['UID']
+            if uid not in graph.nodes:
+                graph.add_node(uid, **{field: row.get(field) for field in NODE_FIELDS})
+            address = row.get('AdapterAddress')
+            if not address:
+                continue
+            for protocol, (caller_types, callee_types, caller_key, callee_key) in EDGE_RULES.items():
+                if row['AdapterDirection'] == 'Receiver' and row['AdapterType'] in caller_types:
+                    key = caller_key(address)
+                    if key:
+                        callers[protocol].setdefault(key, {})[uid] = address
+                elif row['AdapterDirection'] == 'Sender' and row['AdapterType'] in callee_types:
+                    key = callee_key(address)
+                    if key:
+                        callees[protocol].setdefault(key, {})[uid] = address
+
+        # Step 2: Hash join callers and callees on the match key
+        for protocol in EDGE_RULES:
+            protocol_callees = callees[protocol]
+            for key, sources in callers[protocol].items():
+                targets = protocol_callees.get(key)
+                if not targets:
+                    continue
+                for source, address in sources.items():
+                    for target in targets:
+                        graph.add_edge(source, target, protocol, address)
+        return graph
+
+    @classmethod
+    def from_csv(cls, file_path):
+        with open(file_path, newline='', encoding='utf-8') as f:
+            return cls.from_rows(csv.DictReader(f))
+
+    def add_node(self, uid, **attributes):
+        self.nodes[uid] = attributes
+        self.successors.setdefault(uid, {})
+        self.predecessors.setdefault(uid, {})
+
+    def add_edge(self, source, target, protocol, address):
+        label = (protocol, address)
+        labels = self.successors[source].setdefault(target, [])
+        if label not in labels:
+            labels.append(label)
+            self.predecessors[target].setdefault(source, []).append(label)
+
+    def edges(self):
+        for source, targets in self.successors.items():
+            for target, labels in targets.items():
+                for protocol, address in labels:
+                    yield source, target, protocol, address
+
+    def resolve(self, name):
+        # Accept a UID, an IflowID or an iflow name
+        if name in self.nodes:
+            return name
+        for uid, attributes in self.nodes.items():
+            if name in (attributes.get('IflowID'), attributes.get('Iflow')):
+                return uid
+        raise KeyError(f"Unknown iflow: {name}")
+
+    def _reachable(self, start, adjacency):
+        seen = {start}
+        stack = [start]
+        while stack:
+            for neighbour in adjacency[stack.pop()]:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        seen.discard(start)
+        return seen
+
+    def downstream(self, uid):
+        return self._reachable(uid, self.successors)
+
+    def upstream(self, uid):
+        return self._reachable(uid, self.predecessors)
+
+    def cycles(self):
+        # Tarjan's strongly connected components, iterative to avoid recursion limits.
+        # Every component with more than one iflow, or with a self-call, is a cycle.
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        result = []
+        counter = 0
+
+        for root in self.nodes:
+            if root in index:
+                continue
+            work = [(root, iter(self.successors[root]))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                node, neighbours = work[-1]
+                advanced = False
+                for neighbour in neighbours:
+                    if neighbour not in index:
+                        index[neighbour] = lowlink[neighbour] = counter
+                        counter += 1
+                        stack.append(neighbour)
+                        on_stack.add(neighbour)
+                        work.append((neighbour, iter(self.successors[neighbour])))
+                        advanced = True
+                        break
+                    if neighbour in on_stack:
+                        lowlink[node] = min(lowlink[node], index[neighbour])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in self.successors[node]:
+                        result.append(sorted(component))
+        return result
+
+    def to_json(self):
+        return {
+            'nodes': [{'UID': uid, **attributes} for uid, attributes in self.nodes.items()],
+            'edges': [
+                {'source': source, 'target': target, 'protocol': protocol, 'address': address}
+                for source, target, protocol, address in self.edges()
+            ],
+        }
+
+    def to_dot(self):
+        def quote(value):
+            return '"' + str(value or '').replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+        lines = ['digraph iflows {']
+        for uid, attributes in self.nodes.items():
+            lines.append(f'  {quote(uid)} [label={quote(attributes.get("Iflow") or uid)}];')
+        for source, target, protocol, address in self.edges():
+            lines.append(f'  {quote(source)} -> {quote(target)} [label={quote(protocol)}, address={quote(address)}];')
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    def to_graphml(self):
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">',
+        ]
+        for field in NODE_FIELDS:
+            lines.append(f'  <key id="{field}" for="node" attr.name="{field}" attr.type="string"/>')
+        lines.append('  <key id="protocol" for="edge" attr.name="protocol" attr.type="string"/>')
+        lines.append('  <key id="address" for="edge" attr.name="address" attr.type="string"/>')
+        lines.append('  <graph id="iflows" edgedefault="directed">')
+        for uid, attributes in self.nodes.items():
+            lines.append(f'    <node id={quoteattr(uid)}>')
+            for field in NODE_FIELDS:
+                lines.append(f'      <data key="{field}">{escape(attributes.get(field) or "")}</data>')
+            lines.append('    </node>')
+        for source, target, protocol, address in self.edges():
+            lines.append(f'    <edge source={quoteattr(source)} target={quoteattr(target)}>')
+            lines.append(f'      <data key="protocol">{escape(protocol)}</data>')
+            lines.append(f'      <data key="address">{escape(address)}</data>')
+            lines.append('    </edge>')
+        lines.append('  </graph>')
+        lines.append('</graphml>')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, output_path):
+        extension = os.path.splitext(output_path)[1].lower()
+        if extension == '.json':
+            content = json.dumps(self.to_json(), indent=2, ensure_ascii=False)
+        elif extension in ('.dot', '.gv'):
+            content = self.to_dot()
+        elif extension in ('.graphml', '.xml'):
+            content = self.to_graphml()
+        else:
+            raise ValueError(f"Unsupported graph format: {extension or output_path}")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+def describe(graph, uids):
+    return [f"{uid} ({graph.nodes[uid].get('Iflow')})" for uid in sorted(uids)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the iflow call graph built from an AutomaticASIS CSV.")
+    parser.add_argument('csv_file', help="CSV produced by AutomaticASIS.py")
+    parser.add_argument('--downstream', metavar='IFLOW', help="list every iflow reachable from IFLOW")
+    parser.add_argument('--upstream', metavar='IFLOW', help="list every iflow that can reach IFLOW")
+    parser.add_argument('--cycles', action='store_true', help="list groups of iflows that call each other")
+    parser.add_argument('--export', metavar='FILE', help="write the graph as .graphml, .dot or .json")
+    args = parser.parse_args(argv)
+
+    graph = CallGraph.from_csv(args.csv_file)
+    print(f"✅ Built call graph with {len(graph.nodes)} iflows and {sum(1 for _ in graph.edges())} edges.")
+
+    if args.downstream:
+        for line in describe(graph, graph.downstream(graph.resolve(args.downstream))):
+            print(f"  ↓ {line}")
+    if args.upstream:
+        for line in describe(graph, graph.upstream(graph.resolve(args.upstream))):
+            print(f"  ↑ {line}")
+    if args.cycles:
+        for component in graph.cycles():
+            print(f"  🔁 {', '.join(describe(graph, component))}")
+    if args.export:
+        graph.export(args.export)
+        print(f"✅ Exported call graph to '{args.export}'.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import ExtractionCache
+import InternalCalls
+from AdapterRows import is_true
+
+CATALOG_FILE = 'automatic_asis_catalog.sqlite'
+
+# The same iflow may be deployed in several packages, so iflows are keyed per package
+IFLOWS_COLUMNS = (
+    'id INTEGER PRIMARY KEY, iflow_id TEXT NOT NULL, name TEXT, version TEXT, uid TEXT, '
+    'package_id INTEGER NOT NULL REFERENCES packages(id), updated_at TEXT NOT NULL, fingerprint TEXT, '
+    'UNIQUE (package_id, iflow_id)'
+)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS packages ('
+    'id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)',
+    f'CREATE TABLE IF NOT EXISTS iflows ({IFLOWS_COLUMNS})',
+    'CREATE TABLE IF NOT EXISTS adapters ('
+    'iflow_ref INTEGER NOT NULL REFERENCES iflows(id) ON DELETE CASCADE, position INTEGER NOT NULL, '
+    'adapter_type TEXT, transport_protocol TEXT, direction TEXT, name TEXT, version TEXT, address TEXT, '
+    'is_parametrized INTEGER NOT NULL, calls_iflow TEXT, is_called_by_iflow TEXT, '
+    'PRIMARY KEY (iflow_ref, position))',
+    # Package zips seen by watch mode and the iflows each of them produced
+    'CREATE TABLE IF NOT EXISTS sources ('
+    'path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL, '
+    'processed_at TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS source_iflows ('
+    'path TEXT NOT NULL, iflow_ref INTEGER NOT NULL REFERENCES iflows(id) ON DELETE CASCADE, '
+    'PRIMARY KEY (path, iflow_ref))',
+    'CREATE INDEX IF NOT EXISTS adapters_address ON adapters(address)',
+    'CREATE INDEX IF NOT EXISTS adapters_type ON adapters(adapter_type)',
+    'CREATE INDEX IF NOT EXISTS iflows_package ON iflows(package_id)',
+    'CREATE INDEX IF NOT EXISTS iflows_fingerprint ON iflows(fingerprint)',
+    'CREATE INDEX IF NOT EXISTS iflows_iflow_id ON iflows(iflow_id)',
+    'CREATE INDEX IF NOT EXISTS iflows_name ON iflows(name)',
+]
+
+# Same columns as the CSV output
+ADAPTER_ROWS = (
+    'SELECT i.uid AS UID, p.name AS Package, i.name AS Iflow, i.iflow_id AS IflowID, i.version AS IflowVersion, '
+    'a.adapter_type AS AdapterType, a.transport_protocol AS TransportProtocol, a.direction AS AdapterDirection, '
+    'a.name AS AdapterName, a.version AS AdapterVersion, a.address AS AdapterAddress, '
+    'a.is_parametrized AS IsParametrized, i.fingerprint AS Fingerprint, a.calls_iflow AS CallsIflow, '
+    'a.is_called_by_iflow AS IsCalledByIflow '
+    'FROM adapters a JOIN iflows i ON i.id = a.iflow_ref JOIN packages p ON p.id = i.package_id'
+)
+SCHEMA.append(f'CREATE VIEW IF NOT EXISTS adapter_rows AS {ADAPTER_ROWS}')
+
+UPSERT_PACKAGE = 'INSERT INTO packages (name) VALUES (?) ON CONFLICT(name) DO NOTHING'
+UPSERT_IFLOW = (
+    'INSERT INTO iflows (iflow_id, name, version, uid, package_id, updated_at, fingerprint) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT(package_id, iflow_id) DO UPDATE SET name = excluded.name, version = excluded.version, '
+    'uid = excluded.uid, updated_at = excluded.updated_at, fingerprint = excluded.fingerprint'
+)
+SELECT_IFLOW = ('SELECT i.id, i.uid FROM iflows i JOIN packages p ON p.id = i.package_id '
+                'WHERE p.name = ? AND i.iflow_id = ?')
+INSERT_ADAPTER = (
+    'INSERT INTO adapters (iflow_ref, position, adapter_type, transport_protocol, direction, name, version, '
+    'address, is_parametrized, calls_iflow, is_called_by_iflow) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+)
+# Columns added after the first catalog version
+MIGRATIONS = {'adapters': [('calls_iflow', 'TEXT'), ('is_called_by_iflow', 'TEXT')],
+              'iflows': [('fingerprint', 'TEXT')]}
+
+# Filters on the base tables rather than the view, so that their indexes are used
+QUERIES = {
+    'address': 'a.address >= ? AND a.address < ?',
+    'type': 'a.adapter_type = ?',
+    'iflow': '(i.iflow_id = ? OR i.name = ?)',
+    'package': 'p.name = ?',
+}
+ADDRESS_MATCHES = {
+    'exact': 'a.address = ?',
+    # A leading wildcard cannot use the address index
+    'contains': 'a.address LIKE ?',
+}
+# Sorts after every string starting with the prefix
+PREFIX_END = '\U0010ffff'
+
+
+def rekey_iflows(conn):
+    # Catalogs written before iflows were keyed per package have iflow_id UNIQUE on its
+    # own; the table is rebuilt with foreign keys off, so that its adapters are kept
+    for index in conn.execute('PRAGMA index_list(iflows)').fetchall():
+        columns = [info[2] for info in conn.execute(f'PRAGMA index_info({index[1]})')]
+        if index[2] and columns == ['iflow_id']:
+            break
+    else:
+        return
+    with conn:
+        conn.execute('DROP VIEW IF EXISTS adapter_rows')
+        conn.execute(f'CREATE TABLE iflows_rekeyed ({IFLOWS_COLUMNS})')
+        conn.execute('INSERT INTO iflows_rekeyed SELECT id, iflow_id, name, version, uid, package_id, updated_at, '
+                     'fingerprint FROM iflows')
+        conn.execute('DROP TABLE iflows')
+        conn.execute('ALTER TABLE iflows_rekeyed RENAME TO iflows')
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    with conn:
+        for table, columns in MIGRATIONS.items():
+            existing = {info[1] for info in conn.execute(f'PRAGMA table_info({table})')}
+            if existing:
+                for name, column_type in columns:
+                    if name not in existing:
+                        conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+                        conn.execute('DROP VIEW IF EXISTS adapter_rows')
+    rekey_iflows(conn)
+    conn.execute('PRAGMA foreign_keys = ON')
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+    return conn
+
+
+def iflow_key(row):
+    # Iflows without a manifest are kept apart by their UID
+    return row.get('IflowID') or f"{row.get('Package')}/{row.get('UID')}"
+
+
+def catalog_key(row):
+    return row.get('Package') or '', iflow_key(row)
+
+
+class CatalogWriter:
+    # Upserts rows into the catalog; the whole run is a single transaction that
+    # is committed on close(). An iflow seen again replaces its previous adapters.
+
+    def __init__(self, output_path, fieldnames=None):
+        self.output_path = output_path
+        self.rows_written = 0
+        self.conn = connect(output_path)
+        self.updated_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._packages = {}
+        self._iflows = {}     # (package, iflow key) -> (iflows.id, next position)
+        self._uid_numbers = {}
+
+    def _package_id(self, name):
+        package_id = self._packages.get(name)
+        if package_id is None:
+            self.conn.execute(UPSERT_PACKAGE, (name,))
+            package_id = self.conn.execute('SELECT id FROM packages WHERE name = ?', (name,)).fetchone()[0]
+            self._packages[name] = package_id
+        return package_id
+
+    def _iflow(self, row):
+        key = catalog_key(row)
+        entry = self._iflows.get(key)
+        if entry is None:
+            package_id = self._package_id(key[0])
+            self.conn.execute(UPSERT_IFLOW, (key[1], row.get('Iflow'), row.get('IflowVersion'), row.get('UID'),
+                                             package_id, self.updated_at, row.get('Fingerprint')))
+            ref = self.conn.execute('SELECT id FROM iflows WHERE package_id = ? AND iflow_id = ?',
+                                    (package_id, key[1])).fetchone()[0]
+            self.conn.execute('DELETE FROM adapters WHERE iflow_ref = ?', (ref,))
+            entry = [ref, 0]
+            self._iflows[key] = entry
+        return entry
+
+    def write_rows(self, rows):
+        values = []
+        for row in rows:
+            entry = self._iflow(row)
+            entry[1] += 1
+            values.append((entry[0], entry[1], row.get('AdapterType'), row.get('TransportProtocol'),
+                           row.get('AdapterDirection'), row.get('AdapterName'), row.get('AdapterVersion'),
+                           row.get('AdapterAddress'), int(is_true(row.get('IsParametrized'))),
+                           row.get('CallsIflow'), row.get('IsCalledByIflow')))
+        self.conn.executemany(INSERT_ADAPTER, values)
+        self.rows_written += len(values)
+
+    def changed_sources(self, stats):
+        # stats: path -> (size, mtime_ns). Yields (path, digest) for zips that are new or
+        # whose content changed; a zip that was only touched just gets its stat refreshed.
+        for path, (size, mtime_ns) in stats.items():
+            known = self.conn.execute('SELECT size, mtime_ns, digest FROM sources WHERE path = ?',
+                                      (path,)).fetchone()
+            if known and known[:2] == (size, mtime_ns):
+                continue
+            digest = ExtractionCache.file_digest(path)
+            if known and known[2] == digest:
+                self.conn.execute('UPDATE sources SET size = ?, mtime_ns = ? WHERE path = ?', (size, mtime_ns, path))
+                continue
+            yield path, digest
+
+    def _next_uid(self, prefix):
+        number = self._uid_numbers.get(prefix)
+        if number is None:
+            number = 0
+            for (uid,) in self.conn.execute('SELECT uid FROM iflows WHERE substr(uid, 1, ?) = ?',
+                                            (len(prefix) + 1, prefix + '-')):
+                suffix = uid[len(prefix) + 1:]
+                if suffix.isdigit():
+                    number = max(number, int(suffix))
+        self._uid_numbers[prefix] = number + 1
+        return f"{prefix}-{number + 1}"
+
+    def stable_uids(self, rows):
+        # Incremental runs number iflows per package only, so known iflows keep their
+        # catalog UID and new ones continue after the highest UID of their prefix
+        mapping = {}
+        for row in rows:
+            uid = row.get('UID')
+            if uid not in mapping:
+                known = self.conn.execute(SELECT_IFLOW, catalog_key(row)).fetchone()
+                mapping[uid] = known[1] if known and known[1] else self._next_uid(uid.rsplit('-', 1)[0])
+        # Mapped in a second pass, since rows of one iflow may share their UID field
+        for row, uid in [(row, mapping[row.get('UID')]) for row in rows]:
+            row['UID'] = uid
+        return rows
+
+    def _process_direct_addresses(self, iflow_refs):
+        addresses = set()
+        for ref in iflow_refs:
+            for (address,) in self.conn.execute(
+                    "SELECT address FROM adapters WHERE iflow_ref = ? AND adapter_type = 'ProcessDirect'", (ref,)):
+                addresses.add(InternalCalls.normalize_address(address))
+        return addresses
+
+    def update_source(self, path, stat, digest, rows):
+        # Replaces what an earlier version of the package zip contributed. Returns the
+        # ProcessDirect addresses whose links may have changed and the iflows written.
+        previous = {ref for (ref,) in self.conn.execute('SELECT iflow_ref FROM source_iflows WHERE path = ?', (path,))}
+        known = [self.conn.execute(SELECT_IFLOW, key).fetchone()
+                 for key in {catalog_key(row) for row in self.stable_uids(rows)}]
+        addresses = self._process_direct_addresses(previous | {found[0] for found in known if found})
+
+        self.write_rows(rows)
+        current = {self._iflows[catalog_key(row)][0] for row in rows}
+        for ref in previous - current:
+            self.conn.execute('DELETE FROM adapters WHERE iflow_ref = ?', (ref,))
+            self.conn.execute('DELETE FROM source_iflows WHERE iflow_ref = ?', (ref,))
+            self.conn.execute('DELETE FROM iflows WHERE id = ?', (ref,))
+        self.conn.execute('DELETE FROM source_iflows WHERE path = ?', (path,))
+        self.conn.executemany('INSERT OR IGNORE INTO source_iflows (path, iflow_ref) VALUES (?, ?)',
+                              [(path, ref) for ref in current])
+        self.conn.execute(
+            'INSERT INTO sources (path, size, mtime_ns, digest, processed_at) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, '
+            'digest = excluded.digest, processed_at = excluded.processed_at',
+            (path, *stat, digest, self.updated_at)
+        )
+        return addresses | self._process_direct_addresses(current), current
+
+    def relink(self, addresses, iflow_refs=()):
+        # Re-links only the given iflows and the iflows connected, directly or through
+        # other iflows, to the given ProcessDirect addresses; returns how many were re-linked
+        addresses = {address for address in addresses if address}
+        iflows_by_address = {}
+        addresses_by_iflow = {}
+        for ref, address in self.conn.execute(
+                "SELECT iflow_ref, address FROM adapters WHERE adapter_type = 'ProcessDirect'"):
+            address = InternalCalls.normalize_address(address)
+            if address:
+                iflows_by_address.setdefault(address, set()).add(ref)
+                addresses_by_iflow.setdefault(ref, set()).add(address)
+
+        affected = set(iflow_refs)
+        seen = set(addresses)
+        for ref in affected:
+            seen |= addresses_by_iflow.get(ref, set())
+        queue = list(seen)
+        while queue:
+            for ref in iflows_by_address.get(queue.pop(), ()):
+                if ref not in affected:
+                    affected.add(ref)
+                    for address in addresses_by_iflow[ref] - seen:
+                        seen.add(address)
+                        queue.append(address)
+
+        rows = []
+        for ref in sorted(affected):
+            for position, adapter_type, direction, address, uid in self.conn.execute(
+                    'SELECT a.position, a.adapter_type, a.direction, a.address, i.uid FROM adapters a '
+                    'JOIN iflows i ON i.id = a.iflow_ref WHERE a.iflow_ref = ? ORDER BY a.position', (ref,)):
+                rows.append({'ref': ref, 'position': position, 'UID': uid, 'AdapterType': adapter_type,
+                             'AdapterDirection': direction, 'AdapterAddress': address})
+        InternalCalls.link_flows(rows)
+        self.conn.executemany(
+            'UPDATE adapters SET calls_iflow = ?, is_called_by_iflow = ? WHERE iflow_ref = ? AND position = ?',
+            [(row['CallsIflow'], row['IsCalledByIflow'], row['ref'], row['position']) for row in rows]
+        )
+        return len(affected)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+
+def query(conn, kind, value, match='prefix'):
+    # Addresses are matched by prefix unless `match` is 'exact' or 'contains'; a value
+    # holding % is taken as a LIKE pattern
+    condition = QUERIES[kind]
+    params = (value, value) if kind == 'iflow' else (value,)
+    if kind == 'address':
+        if '%' in value:
+            condition = ADDRESS_MATCHES['contains']
+        elif match == 'contains':
+            condition, params = ADDRESS_MATCHES['contains'], (f'%{value}%',)
+        elif match == 'exact':
+            condition = ADDRESS_MATCHES['exact']
+        else:
+            params = (value, value + PREFIX_END)
+    cursor = conn.execute(f'{ADAPTER_ROWS} WHERE {condition} ORDER BY UID, IflowID', params)
+    return [description[0] for description in cursor.description], cursor.fetchall()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up adapters in the AutomaticASIS SQLite catalog.")
+    parser.add_argument('--catalog', default=CATALOG_FILE, metavar='PATH', help=f"catalog file (default {CATALOG_FILE})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    address = subparsers.add_parser('address',
+                                    help="adapters whose address starts with TEXT (or matches a LIKE pattern)")
+    address.add_argument('value', metavar='TEXT')
+    match = address.add_mutually_exclusive_group()
+    match.add_argument('--exact', action='store_const', const='exact', dest='match', default='prefix',
+                       help="only addresses equal to TEXT")
+    match.add_argument('--contains', action='store_const', const='contains', dest='match',
+                       help="addresses containing TEXT anywhere (scans every adapter)")
+    for kind, description in (('type', "adapters of an adapter type, e.g. SFTP or JDBC"),
+                              ('iflow', "adapters of an iflow, by ID or name"),
+                              ('package', "adapters of a package")):
+        subparsers.add_parser(kind, help=description).add_argument('value', metavar='TEXT')
+    subparsers.add_parser('sql', help="run a read-only SQL query").add_argument('statement', metavar='SQL')
+    subparsers.add_parser('stats', help="count packages, iflows and adapters")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.catalog):
+        raise FileNotFoundError(f"'{args.catalog}' not found.")
+    conn = sqlite3.connect(f'file:{args.catalog}?mode=ro', uri=True)
+    try:
+        if args.command == 'stats':
+            for table in ('packages', 'iflows', 'adapters'):
+                print(f"{table}: {conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]}")
+            return
+        if args.command == 'sql':
+            cursor = conn.execute(args.statement)
+            columns, rows = [d[0] for d in cursor.description or ()], cursor.fetchall()
+        else:
+            columns, rows = query(conn, args.command, args.value, getattr(args, 'match', 'prefix'))
+        print(' | '.join(columns))
+        for row in rows:
+            print(' | '.join('' if value is None else str(value) for value in row))
+        print(f"✅ {len(rows)} rows.")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
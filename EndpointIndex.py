@@ -0,0 +1,281 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import time
+from urllib.parse import urlsplit
+
+from InternalCalls import normalize_address
+
+INDEX_FILE = 'automatic_asis_endpoints.json'
+INDEX_VERSION = 1
+
+ROW_FIELDS = ['UID', 'Package', 'Iflow', 'IflowID', 'AdapterType', 'AdapterDirection', 'AdapterName',
+              'AdapterAddress']
+COMPONENT_FIELDS = ['Scheme', 'Host', 'Port', 'Path']
+ENDPOINT_FIELDS = ROW_FIELDS + COMPONENT_FIELDS
+
+# Adapters whose address starts with a server name rather than a path:
+# 'sftp.example.com:22', 'smtp.example.com', a JDBC alias, Kafka/AMQP '{host}/{topic}'
+HOST_ADAPTERS = {'SFTP', 'PollingSFTP', 'Mail', 'JDBC', 'Kafka', 'AMQP', 'FTP', 'OFTP'}
+
+
+def split_port(netloc):
+    host, sep, port = netloc.rpartition(':')
+    if sep and port.isdigit() and host and not host.endswith(']'):
+        return host, int(port)
+    return netloc, None
+
+
+def parse_address(adapter_type, address):
+    # address -> (scheme, host, port, path), from its normalized form. Addresses
+    # without a scheme get the adapter type as their scheme (e.g. 'jms', 'processdirect').
+    # Returns None for empty addresses and unresolved {{parameters}}.
+    address = normalize_address(address)
+    if not address or '{{' in address:
+        return None
+    if '://' in address:
+        parts = urlsplit(address)
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        return parts.scheme, parts.hostname, port, parts.path.rstrip('/')
+    scheme = (adapter_type or '').lower()
+    if adapter_type in HOST_ADAPTERS:
+        netloc, slash, path = address.partition('/')
+        host, port = split_port(netloc)
+        return scheme, host, port, slash + path
+    # ProcessDirect addresses, HTTPS sender paths, JMS queue names...
+    return scheme, None, None, address if address.startswith('/') else '/' + address
+
+
+def path_segments(path):
+    return [segment for segment in normalize_address(path).split('/') if segment]
+
+
+def host_labels(host):
+    # 'api.example.com' -> ['com', 'example', 'api'], so that a domain is a prefix of its subdomains
+    return normalize_address(host).lstrip('*.').split('.')[::-1]
+
+
+class Trie:
+    # Segment trie: a prefix matches whole segments only, so '/api/v1/orders'
+    # finds '/api/v1/orders' and '/api/v1/orders/42' but not '/api/v1/ordersx'
+
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = []
+
+    def insert(self, segments, endpoint_id):
+        node = self
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = Trie()
+            node = child
+        node.ids.append(endpoint_id)
+
+    def find(self, segments):
+        node = self
+        for segment in segments:
+            node = node.children.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def exact(self, segments):
+        node = self.find(segments)
+        return list(node.ids) if node is not None else []
+
+    def under(self, segments):
+        node = self.find(segments)
+        if node is None:
+            return []
+        ids = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            ids.extend(node.ids)
+            stack.extend(node.children.values())
+        ids.sort()
+        return ids
+
+
+class EndpointIndex:
+    # Endpoints are kept as tuples in ENDPOINT_FIELDS order; the host map, the
+    # domain trie and the path trie hold their positions in self.endpoints
+
+    def __init__(self):
+        self.endpoints = []
+        self.hosts = {}
+        self.domains = Trie()
+        self.paths = Trie()
+        self.skipped = 0
+
+    def add(self, endpoint):
+        endpoint_id = len(self.endpoints)
+        self.endpoints.append(endpoint)
+        host, path = endpoint[-3], endpoint[-1]
+        if host:
+            self.hosts.setdefault(host, []).append(endpoint_id)
+            self.domains.insert(host_labels(host), endpoint_id)
+        if path:
+            self.paths.insert(path_segments(path), endpoint_id)
+
+    def add_rows(self, rows):
+        for row in rows:
+            components = parse_address(row.get('AdapterType'), row.get('AdapterAddress'))
+            if components is None:
+                self.skipped += 1
+                continue
+            self.add(tuple(row.get(field) for field in ROW_FIELDS) + components)
+
+    @classmethod
+    def from_rows(cls, rows):
+        index = cls()
+        index.add_rows(rows)
+        return index
+
+    def host(self, host, subdomains=False):
+        # 'example.com' -> that host; with subdomains (or '*.example.com') also 'api.example.com'...
+        if subdomains or host.startswith('*.'):
+            return self.domains.under(host_labels(host))
+        return list(self.hosts.get(normalize_address(host), ()))
+
+    def path(self, prefix, exact=False):
+        segments = path_segments(prefix)
+        return self.paths.exact(segments) if exact else self.paths.under(segments)
+
+    def lookup(self, host=None, path=None, subdomains=False, exact=False):
+        ids = None
+        if host:
+            ids = self.host(host, subdomains)
+        if path:
+            matches = self.path(path, exact)
+            ids = matches if ids is None else sorted(set(ids).intersection(matches))
+        return [dict(zip(ENDPOINT_FIELDS, self.endpoints[endpoint_id])) for endpoint_id in ids or ()]
+
+    def save(self, path):
+        # Only the endpoints are stored; the maps are rebuilt on load
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'fields': ENDPOINT_FIELDS, 'skipped': self.skipped,
+                       'endpoints': self.endpoints}, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION or data.get('fields') != ENDPOINT_FIELDS:
+            raise ValueError(f"'{path}' was written by another version of the endpoint index; build it again.")
+        index = cls()
+        for endpoint in data['endpoints']:
+            index.add(tuple(endpoint))
+        index.skipped = data.get('skipped', 0)
+        return index
+
+    def stats(self):
+        schemes = {}
+        for endpoint in self.endpoints:
+            schemes[endpoint[-4]] = schemes.get(endpoint[-4], 0) + 1
+        return {'endpoints': len(self.endpoints), 'hosts': len(self.hosts), 'skipped': self.skipped,
+                'schemes': dict(sorted(schemes.items(), key=lambda item: (-item[1], item[0] or '')))}
+
+
+def index_summary(endpoints, skipped, path):
+    return f"✅ Indexed {endpoints} endpoints into '{path}' ({skipped} rows without a resolved address)."
+
+
+class IndexWriter:
+    # Indexes the rows of a run as they are written; the index is saved on close().
+    # rows_written counts the endpoints, not the rows left out for lack of an address.
+
+    def __init__(self, output_path, fieldnames=None):
+        self.output_path = output_path
+        self.rows_written = 0
+        self.skipped = 0
+        self.index = EndpointIndex()
+
+    def write_rows(self, rows):
+        self.index.add_rows(rows)
+        self.rows_written = len(self.index.endpoints)
+        self.skipped = self.index.skipped
+
+    def summary(self):
+        return index_summary(self.rows_written, self.skipped, self.output_path)
+
+    def close(self):
+        if self.index is not None:
+            self.index.save(self.output_path)
+            self.index = None
+
+
+def read_rows(source):
+    # A CSV produced by AutomaticASIS.py, or a catalog (its adapter_rows view)
+    with open(source, 'rb') as f:
+        is_sqlite = f.read(16) == b'SQLite format 3\x00'
+    if is_sqlite:
+        conn = sqlite3.connect(f'file:{source}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in conn.execute('SELECT * FROM adapter_rows ORDER BY UID')]
+        finally:
+            conn.close()
+    with open(source, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def print_endpoints(endpoints, elapsed):
+    for endpoint in endpoints:
+        print(f"  {endpoint['UID']} | {endpoint['Iflow']} | {endpoint['AdapterType']} {endpoint['AdapterDirection']}"
+              f" | {endpoint['AdapterAddress']}")
+    print(f"✅ {len(endpoints)} endpoints ({elapsed * 1000:.3f} ms).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the iflows that talk to a host or to a path.")
+    parser.add_argument('--index', default=INDEX_FILE, metavar='PATH', help=f"index file (default {INDEX_FILE})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="index the rows of an AutomaticASIS CSV or catalog")
+    build.add_argument('source', metavar='FILE', help="automatic_asis_<id>.csv or a catalog .sqlite")
+    host = subparsers.add_parser('host', help="endpoints on a host, e.g. sftp.example.com or *.example.com")
+    host.add_argument('value', metavar='HOST')
+    host.add_argument('--subdomains', action='store_true', help="also match subdomains of HOST")
+    host.add_argument('--path', metavar='PREFIX', help="only endpoints under this path")
+    host.add_argument('--json', action='store_true', help="print the matching endpoints as JSON")
+    path = subparsers.add_parser('path', help="endpoints under a path prefix, e.g. /api/v1/orders or a JMS queue")
+    path.add_argument('value', metavar='PREFIX')
+    path.add_argument('--exact', action='store_true', help="only this path, not the paths under it")
+    path.add_argument('--json', action='store_true', help="print the matching endpoints as JSON")
+    subparsers.add_parser('stats', help="count endpoints, hosts and schemes")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        if not os.path.isfile(args.source):
+            raise FileNotFoundError(f"'{args.source}' not found.")
+        index = EndpointIndex.from_rows(read_rows(args.source))
+        index.save(args.index)
+        print(index_summary(len(index.endpoints), index.skipped, args.index))
+        return
+
+    index = EndpointIndex.load(args.index)
+    if args.command == 'stats':
+        print(json.dumps(index.stats(), indent=2, ensure_ascii=False))
+        return
+    start = time.perf_counter()
+    if args.command == 'host':
+        endpoints = index.lookup(host=args.value, path=args.path, subdomains=args.subdomains)
+    else:
+        endpoints = index.lookup(path=args.value, exact=args.exact)
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(endpoints, indent=2, ensure_ascii=False))
+    else:
+        print_endpoints(endpoints, elapsed)
+
+
+if __name__ == '__main__':
+    main()
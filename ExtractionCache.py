@@ -0,0 +1,118 @@
+import hashlib
+import json
+import sqlite3
+
+import AdapterRows
+
+CACHE_FILE = 'automatic_asis_cache.sqlite'
+DEFAULT_MAX_AGE = 5
+
+# Fields that depend on where the archive was found rather than on its content
+CONTEXT_FIELDS = ('UID', 'Package')
+
+
+def archive_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_digest(*parts):
+    # Each part is length-prefixed, so bytes cannot move from one part to the next unnoticed
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()[:16]
+
+
+def config_digest(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def strip_context(rows):
+    tables = getattr(rows, 'tables', None)
+    if tables:
+        return {'rows': strip_context(list(rows)), 'tables': {name: strip_context(table)
+                                                              for name, table in tables.items()}}
+    return [{k: v for k, v in row.items() if k not in CONTEXT_FIELDS} for row in rows]
+
+
+def restore_context(rows, package_name, uid):
+    # Entries with step tables are stored as {'rows': [...], 'tables': {...}}
+    if isinstance(rows, dict):
+        tables = {name: [dict(row, UID=uid, Package=package_name) for row in table]
+                  for name, table in rows['tables'].items()}
+        return AdapterRows.RowBatch(AdapterRows.from_dicts(rows['rows'], uid, package_name), tables)
+    return AdapterRows.from_dicts(rows, uid, package_name)
+
+
+# Read-only connection per process, used by worker processes to look up rows
+_readers = {}
+
+
+def lookup_rows(cache_path, config_version, digest):
+    conn = _readers.get(cache_path)
+    if conn is None:
+        conn = _readers[cache_path] = sqlite3.connect(f'file:{cache_path}?mode=ro', uri=True)
+    found = conn.execute(
+        'SELECT rows FROM entries WHERE digest = ? AND config = ?', (digest, config_version)
+    ).fetchone()
+    return json.loads(found[0]) if found else None
+
+
+class ExtractionCache:
+    def __init__(self, path, config_version, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.config_version = config_version
+        self.max_age = max_age
+        self.conn = sqlite3.connect(path)
+        # The run is one long write transaction; with WAL, lookups from this and the
+        # worker processes never wait for it, however much it has written
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS runs (run INTEGER NOT NULL)')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'digest TEXT NOT NULL, config TEXT NOT NULL, rows TEXT NOT NULL, last_run INTEGER NOT NULL, '
+                'PRIMARY KEY (digest, config))'
+            )
+            last = self.conn.execute('SELECT MAX(run) FROM runs').fetchone()[0] or 0
+            self.run = last + 1
+            self.conn.execute('DELETE FROM runs')
+            self.conn.execute('INSERT INTO runs (run) VALUES (?)', (self.run,))
+        self.hits = 0
+        self.misses = 0
+
+    def touch(self, digest):
+        self.hits += 1
+        self.conn.execute(
+            'UPDATE entries SET last_run = ? WHERE digest = ? AND config = ?',
+            (self.run, digest, self.config_version)
+        )
+
+    def store(self, digest, rows):
+        self.misses += 1
+        self.conn.execute(
+            'INSERT OR REPLACE INTO entries (digest, config, rows, last_run) VALUES (?, ?, ?, ?)',
+            (digest, self.config_version, json.dumps(strip_context(rows)), self.run)
+        )
+
+    def close(self):
+        # Evict entries that were not used during the last max_age runs
+        with self.conn:
+            evicted = self.conn.execute(
+                'DELETE FROM entries WHERE last_run <= ?', (self.run - self.max_age,)
+            ).rowcount
+        # The read-only connection goes first, so that closing the writer can remove the WAL
+        reader = _readers.pop(self.path, None)
+        if reader is not None:
+            reader.close()
+        self.conn.close()
+        return evicted
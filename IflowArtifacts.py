@@ -0,0 +1,328 @@
+import abc
+import re
+import xml.etree.ElementTree as ET
+
+# Columns every step table starts with, so its rows can be joined to the adapter rows
+CONTEXT_FIELDNAMES = ['UID', 'Package', 'Iflow', 'IflowID']
+# Elements whose name is reported as the Process of the steps inside them
+SCOPE_TAGS = {'process', 'subProcess'}
+SCRIPT_DIR = 'src/main/resources/script/'
+URI_PREFIX = re.compile(r'^\w+://[^/]*/')
+TABLE_ROW = re.compile(r'<row>(.*?)</row>', re.DOTALL)
+TABLE_CELL = re.compile(r'<cell id=[\'"](\w+)[\'"]>(.*?)</cell>', re.DOTALL)
+
+# Table name -> extractor class
+EXTRACTORS = {}
+
+
+def register(extractor_class):
+    EXTRACTORS[extractor_class.name] = extractor_class
+    return extractor_class
+
+
+# Qualified tag -> local name, so each distinct tag is split only once
+_local_names = {}
+
+
+def local_name(tag):
+    name = _local_names.get(tag)
+    if name is None:
+        name = _local_names[tag] = tag.split('}', 1)[-1] if '}' in tag else tag
+    return name
+
+
+def read_property(prop):
+    key = value = None
+    for kv in prop:
+        tag = local_name(kv.tag)
+        if tag == 'key':
+            key = kv.text
+        elif tag == 'value':
+            value = kv.text
+    return key, value
+
+
+def element_properties(elem):
+    # key/value pairs of the element's extensionElements
+    properties = {}
+    for child in elem:
+        if local_name(child.tag) != 'extensionElements':
+            continue
+        for prop in child.iter():
+            if local_name(prop.tag) != 'property':
+                continue
+            key, value = read_property(prop)
+            if key:
+                properties[key] = value
+    return properties
+
+
+def resource_path(uri):
+    # 'dir://mmap/src/main/resources/mapping/Order.mmap' -> 'src/main/resources/mapping/Order.mmap'
+    return URI_PREFIX.sub('', uri) if uri else uri
+
+
+def table_column(table, cell='Name'):
+    # Content modifier tables are stored as escaped <row><cell id='...'>...</cell></row> text
+    if not table:
+        return ''
+    values = []
+    for row in TABLE_ROW.findall(table):
+        cells = dict(TABLE_CELL.findall(row))
+        if cells.get(cell):
+            values.append(cells[cell])
+    return ', '.join(values)
+
+
+class Extractor(abc.ABC):
+    # Subscribes to element names; handle() is called once per subscribed element,
+    # when it closes, so its whole subtree is available. Rows go to the table `name`.
+
+    name = None
+    tags = ()
+    fields = []
+    # Columns that columnar output stores with their own type (see OutputWriters.FIELD_TYPES)
+    field_types = {}
+
+    def __init__(self, iflow):
+        self.iflow = iflow
+        self.rows = []
+
+    @classmethod
+    def fieldnames(cls):
+        return CONTEXT_FIELDNAMES + cls.fields
+
+    def row(self, **values):
+        iflow = self.iflow
+        row = {'UID': iflow.uid, 'Package': iflow.package, 'Iflow': iflow.name, 'IflowID': iflow.iflow_id}
+        row.update(values)
+        return row
+
+    @abc.abstractmethod
+    def handle(self, elem, properties, scope):
+        pass
+
+    def finish(self):
+        pass
+
+
+class StepExtractor(Extractor):
+    # Process steps of the given activity types
+
+    tags = ('callActivity', 'serviceTask')
+    activity_types = ()
+
+    def handle(self, elem, properties, scope):
+        if properties.get('activityType') in self.activity_types and self.accepts(properties):
+            self.rows.append(self.row(StepID=elem.get('id'), StepName=elem.get('name'), Process=scope,
+                                      **self.step_fields(properties)))
+
+    def accepts(self, properties):
+        return True
+
+    def step_fields(self, properties):
+        return {}
+
+
+@register
+class ScriptExtractor(StepExtractor):
+    name = 'scripts'
+    fields = ['StepID', 'StepName', 'Process', 'ScriptType', 'Script', 'Function', 'Resource']
+    activity_types = ('Script',)
+
+    def step_fields(self, properties):
+        script = properties.get('script')
+        resource = script if not script or '/' in script else SCRIPT_DIR + script
+        return {'ScriptType': properties.get('subActivityType'), 'Script': script,
+                'Function': properties.get('scriptFunction'), 'Resource': resource}
+
+
+def is_xslt(properties):
+    return 'XSLTMapping' in (properties.get('activityType'), properties.get('subActivityType'))
+
+
+@register
+class MessageMappingExtractor(StepExtractor):
+    name = 'message_mappings'
+    fields = ['StepID', 'StepName', 'Process', 'MappingType', 'Mapping', 'Resource']
+    activity_types = ('Mapping',)
+
+    def accepts(self, properties):
+        return not is_xslt(properties)
+
+    def step_fields(self, properties):
+        uri = properties.get('mappinguri')
+        return {'MappingType': properties.get('subActivityType'),
+                'Mapping': properties.get('mappingname'),
+                'Resource': resource_path(uri) or properties.get('mappingpath')}
+
+
+@register
+class XsltExtractor(StepExtractor):
+    name = 'xslt'
+    fields = ['StepID', 'StepName', 'Process', 'Mapping', 'OutputFormat', 'Resource']
+    activity_types = ('Mapping', 'XSLTMapping')
+
+    def accepts(self, properties):
+        return is_xslt(properties)
+
+    def step_fields(self, properties):
+        uri = properties.get('mappinguri')
+        return {'Mapping': properties.get('mappingname'), 'OutputFormat': properties.get('mappingoutputformat'),
+                'Resource': resource_path(uri) or properties.get('mappingpath')}
+
+
+@register
+class ContentModifierExtractor(StepExtractor):
+    name = 'content_modifiers'
+    fields = ['StepID', 'StepName', 'Process', 'Headers', 'Properties', 'BodyType', 'Body']
+    activity_types = ('Enricher',)
+
+    def step_fields(self, properties):
+        return {'Headers': table_column(properties.get('headerTable')),
+                'Properties': table_column(properties.get('propertyTable')),
+                'BodyType': properties.get('bodyType'), 'Body': properties.get('wrapContent')}
+
+
+@register
+class RouterExtractor(Extractor):
+    # One row per route; routes are the sequence flows leaving a router, which
+    # may come before or after the router in the document
+    name = 'routers'
+    tags = ('exclusiveGateway', 'sequenceFlow')
+    fields = ['RouterID', 'RouterName', 'Process', 'Route', 'ConditionType', 'Condition', 'IsDefault', 'Target']
+    field_types = {'IsDefault': bool}
+
+    def __init__(self, iflow):
+        super().__init__(iflow)
+        self.routers = []
+        self.routes = {}
+
+    def handle(self, elem, properties, scope):
+        if local_name(elem.tag) == 'exclusiveGateway':
+            self.routers.append((elem.get('id'), elem.get('name'), scope, elem.get('default')))
+        else:
+            self.routes.setdefault(elem.get('sourceRef'), []).append(
+                (elem.get('id'), elem.get('name'), properties.get('expressionType'), properties.get('expression'),
+                 elem.get('targetRef')))
+
+    def finish(self):
+        for router_id, router_name, scope, default in self.routers:
+            for route_id, route_name, condition_type, condition, target in self.routes.get(router_id, ()):
+                self.rows.append(self.row(RouterID=router_id, RouterName=router_name, Process=scope,
+                                          Route=route_name, ConditionType=condition_type, Condition=condition,
+                                          IsDefault=route_id == default, Target=target))
+
+
+@register
+class ExceptionSubprocessExtractor(Extractor):
+    name = 'exception_subprocesses'
+    tags = ('subProcess',)
+    fields = ['SubprocessID', 'SubprocessName', 'Process', 'Steps', 'StepTypes']
+    field_types = {'Steps': int}
+
+    def handle(self, elem, properties, scope):
+        if properties.get('activityType') != 'ErrorEventSubProcessTemplate':
+            return
+        step_types = []
+        steps = 0
+        for child in elem.iter():
+            if child is not elem and local_name(child.tag) in StepExtractor.tags:
+                steps += 1
+                step_type = element_properties(child).get('activityType')
+                if step_type and step_type not in step_types:
+                    step_types.append(step_type)
+        self.rows.append(self.row(SubprocessID=elem.get('id'), SubprocessName=elem.get('name'), Process=scope,
+                                  Steps=steps, StepTypes=', '.join(step_types)))
+
+
+def create(names, iflow):
+    return [EXTRACTORS[name](iflow) for name in names]
+
+
+def stream_pass(source, subscribers):
+    # Finished elements are cleared unless a subscribed element is still open around
+    # them, so memory stays bounded by the open elements; returns the element count
+    watched = SCOPE_TAGS.union(subscribers)
+    names = _local_names
+    stack = []
+    scopes = []           # (element, name) of the enclosing processes
+    open_subscribed = 0
+    elements = 0
+
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        name = names.get(elem.tag) or local_name(elem.tag)
+        if event == 'start':
+            if name in watched:
+                if name in subscribers:
+                    open_subscribed += 1
+                if name in SCOPE_TAGS:
+                    scopes.append((elem, elem.get('name') or elem.get('id')))
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        elements += 1
+        if scopes and scopes[-1][0] is elem:
+            scopes.pop()
+        handlers = subscribers.get(name)
+        if handlers:
+            open_subscribed -= 1
+            properties = element_properties(elem)
+            scope = scopes[-1][1] if scopes else None
+            for extractor in handlers:
+                extractor.handle(elem, properties, scope)
+        if not open_subscribed:
+            elem.clear()
+            if stack:
+                del stack[-1][:]
+    return elements
+
+
+def walk_tree(elem, subscribers, scope=None):
+    # Same calls as stream_pass, on a parsed tree: each child is handled after its
+    # subtree, with the process around it; returns the number of elements below elem
+    names = _local_names
+    elements = 0
+    for child in elem:
+        name = names.get(child.tag) or local_name(child.tag)
+        if len(child):
+            inner = (child.get('name') or child.get('id')) if name in SCOPE_TAGS else scope
+            elements += walk_tree(child, subscribers, inner)
+        elements += 1
+        handlers = subscribers.get(name)
+        if handlers:
+            properties = element_properties(child)
+            for extractor in handlers:
+                extractor.handle(child, properties, scope)
+    return elements
+
+
+def run_pass(source, extractors, stats=None, streaming=True):
+    # One pass over the .iflw feeds every extractor: streamed with iterparse, or over
+    # the whole parsed tree, which is faster when memory is not a concern
+    subscribers = {}
+    for extractor in extractors:
+        for tag in extractor.tags:
+            subscribers.setdefault(tag, []).append(extractor)
+    if streaming:
+        elements = stream_pass(source, subscribers)
+    else:
+        root = ET.parse(source).getroot()
+        elements = walk_tree(root, subscribers) + 1
+        handlers = subscribers.get(local_name(root.tag))
+        if handlers:
+            properties = element_properties(root)
+            for extractor in handlers:
+                extractor.handle(root, properties, None)
+
+    for extractor in extractors:
+        extractor.finish()
+    if stats is not None:
+        stats['elements'] = elements
+    return extractors
+
+
+def copy_tables(tables, uid, package):
+    # The step tables of an identical iflow, under another UID and Package
+    return {name: [dict(row, UID=uid, Package=package) for row in rows] for name, rows in tables.items()}
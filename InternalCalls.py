@@ -6,6 +6,44 @@ def normalize_address(address):
         return ''
     return address.strip().rstrip('/').lower()
 
+def append_uid(row, idx, uid):
+    if row[idx]:
+        row[idx] += f", {uid}"
+    else:
+        row[idx] = uid
+
+def link_rows(rows, idx_uid, idx_type, idx_dir, idx_addr, idx_calls, idx_called_by):
+    # Works on list rows (column indexes) and dict rows (column names) alike
+
+    # Step 1: Index the first row of every UID and map address → receiver UIDs
+    uid_rows = {}
+    receiver_map = {}
+    for row in rows:
+        uid_rows.setdefault(row[idx_uid], row)
+        if row[idx_type] == "ProcessDirect" and row[idx_dir] == "Receiver":
+            addr = normalize_address(row[idx_addr])
+            if addr:
+                # dict keys keep insertion order and drop duplicate UIDs
+                receiver_map.setdefault(addr, {})[row[idx_uid]] = None
+
+    # Step 2: Match senders to every receiver on the same address
+    for row in rows:
+        if row[idx_type] == "ProcessDirect" and row[idx_dir] == "Sender":
+            sender_uid = row[idx_uid]
+            for receiver_uid in receiver_map.get(normalize_address(row[idx_addr]), ()):
+                append_uid(uid_rows[receiver_uid], idx_called_by, sender_uid)
+                append_uid(row, idx_calls, receiver_uid)
+
+    return rows
+
+def link_flows(flows):
+    # Adds CallsIflow / IsCalledByIflow to the row dicts built by AutomaticASIS
+    for flow in flows:
+        flow.setdefault("CallsIflow", "")
+        flow.setdefault("IsCalledByIflow", "")
+    return link_rows(flows, "UID", "AdapterType", "AdapterDirection", "AdapterAddress",
+                     "CallsIflow", "IsCalledByIflow")
+
 def process_csv_file(file_path):
     rows = []
 
@@ -30,43 +68,15 @@ def process_csv_file(file_path):
             rows.append(row)
 
     # Index helpers
-    idx_uid = headers.index("UID")
-    idx_type = headers.index("AdapterType")
-    idx_dir = headers.index("AdapterDirection")
-    idx_addr = headers.index("AdapterAddress")
-    idx_calls = headers.index("CallsIflow")
-    idx_called_by = headers.index("IsCalledByIflow")
-
-    # Step 1: Build mapping of address → receiver UIDs
-    receiver_map = {}
-    for row in rows:
-        if row[idx_type] == "ProcessDirect" and row[idx_dir] == "Receiver":
-            addr = normalize_address(row[idx_addr])
-            if addr:
-                receiver_map[addr] = row[idx_uid]
-
-    # Step 2: Match senders to receivers by address
-    for row in rows:
-        if row[idx_type] == "ProcessDirect" and row[idx_dir] == "Sender":
-            addr = normalize_address(row[idx_addr])
-            if addr in receiver_map:
-                sender_uid = row[idx_uid]
-                receiver_uid = receiver_map[addr]
-
-                # Find receiver row and update IsCalledByIflow
-                for r in rows:
-                    if r[idx_uid] == receiver_uid:
-                        if r[idx_called_by]:
-                            r[idx_called_by] += f", {sender_uid}"
-                        else:
-                            r[idx_called_by] = sender_uid
-                        break
-
-                # Update sender row with CallsIflow
-                if row[idx_calls]:
-                    row[idx_calls] += f", {receiver_uid}"
-                else:
-                    row[idx_calls] = receiver_uid
+    link_rows(
+        rows,
+        idx_uid=headers.index("UID"),
+        idx_type=headers.index("AdapterType"),
+        idx_dir=headers.index("AdapterDirection"),
+        idx_addr=headers.index("AdapterAddress"),
+        idx_calls=headers.index("CallsIflow"),
+        idx_called_by=headers.index("IsCalledByIflow"),
+    )
 
     # Write back to a new CSV
     output_file = os.path.splitext(file_path)[0] + "_with_links.csv"
@@ -77,11 +87,16 @@ def process_csv_file(file_path):
 
     print(f"✅ Processed: {file_path} → {output_file}")
 
-def main():
-    current_dir = os.getcwd()
-    for filename in os.listdir(current_dir):
-        if filename.lower().endswith('.csv'):
-            process_csv_file(os.path.join(current_dir, filename))
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Add the ProcessDirect CallsIflow/IsCalledByIflow links to CSV files.")
+    parser.add_argument('files', nargs='*', metavar='CSV',
+                        help="CSV files produced by AutomaticASIS.py (default: every CSV in the current directory)")
+    args = parser.parse_args(argv)
+
+    files = args.files or sorted(filename for filename in os.listdir(os.getcwd()) if filename.lower().endswith('.csv'))
+    for file_path in files:
+        process_csv_file(file_path)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,313 @@
+import argparse
+import csv
+import json
+import os
+import time
+from array import array
+from collections import Counter
+from html import escape
+from itertools import islice
+from operator import itemgetter, methodcaller
+
+from AdapterRows import is_true, text
+from InternalCalls import normalize_address
+
+REPORT_FILE = 'automatic_asis_report'
+DEFAULT_TOP = 25
+DEFAULT_BATCH_SIZE = 10000
+# Columns the report reads; each is stored categorically (see Column)
+REPORT_FIELDS = ['UID', 'Package', 'IflowVersion', 'AdapterType', 'AdapterDirection', 'AdapterVersion',
+                 'IsParametrized', 'AdapterAddress']
+
+
+def endpoint_key(address):
+    # Unresolved {{parameters}} are not endpoints
+    address = normalize_address(address)
+    return '' if '{{' in address else address
+
+
+CONVERTERS = {'IsParametrized': is_true, 'AdapterAddress': endpoint_key}
+
+
+class Column:
+    # Categorical column: one integer code per row, each distinct value stored once.
+    # Group-bys are Counters over the codes (zip() of several columns for multi-key ones).
+
+    __slots__ = ('convert', 'codes', 'values', 'index', 'raw_codes')
+
+    def __init__(self, convert=text):
+        self.convert = convert
+        self.codes = array('L')
+        self.values = []
+        self.index = {}          # value -> code
+        self.raw_codes = {}      # value as read (before convert) -> code
+
+    def extend(self, raw_values):
+        # Only the values not seen before are converted and encoded one by one;
+        # the codes of the whole batch are then looked up in one map()
+        raw_codes = self.raw_codes
+        for raw in set(raw_values).difference(raw_codes):
+            value = self.convert(raw)
+            code = self.index.get(value)
+            if code is None:
+                code = self.index[value] = len(self.values)
+                self.values.append(value)
+            raw_codes[raw] = code
+        self.codes.extend(map(raw_codes.__getitem__, raw_values))
+
+    def counts(self):
+        return Counter(self.codes)
+
+
+class Snapshot:
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.columns = {field: Column(CONVERTERS.get(field, text)) for field in REPORT_FIELDS}
+
+    def add_batch(self, rows, getters):
+        # getters: field -> function that picks the field's value out of a row
+        for field, getter in getters.items():
+            self.columns[field].extend(list(map(getter, rows)))
+        self.rows += len(rows)
+
+    def add_rows(self, rows, batch_size=DEFAULT_BATCH_SIZE):
+        # Mappings: extracted rows, or rows from a catalog
+        getters = {field: methodcaller('get', field) for field in REPORT_FIELDS}
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return self
+            self.add_batch(batch, getters)
+
+    def add_csv(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        # Reads the columns by position, which is much faster than csv.DictReader
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            missing = lambda row: None
+            getters = {field: itemgetter(header.index(field)) if field in header else missing
+                       for field in REPORT_FIELDS}
+            while True:
+                batch = list(islice(reader, batch_size))
+                if not batch:
+                    return self
+                self.add_batch(batch, getters)
+
+
+def ratio(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+def by_count(counter, values=None):
+    # Most frequent first, then by name; `values` turns codes into names
+    if values is None:
+        return sorted(counter.items(), key=lambda item: (-item[1], text(item[0])))
+    return sorted(counter.items(), key=lambda item: (-item[1], text(values[item[0]])))
+
+
+def summarize(snapshot, top=DEFAULT_TOP):
+    columns = snapshot.columns
+    uid, package, iflow_version = columns['UID'], columns['Package'], columns['IflowVersion']
+    adapter_type, direction, version = columns['AdapterType'], columns['AdapterDirection'], columns['AdapterVersion']
+    parametrized, address = columns['IsParametrized'], columns['AdapterAddress']
+    types, directions, versions = adapter_type.values, direction.values, version.values
+    is_parametrized = parametrized.values
+
+    parametrized_total = sum(n for code, n in parametrized.counts().items() if is_parametrized[code])
+    totals = {'packages': len(package.values), 'iflows': len(uid.values), 'adapters': snapshot.rows,
+              'parametrized': parametrized_total, 'parametrized_ratio': ratio(parametrized_total, snapshot.rows)}
+
+    # Adapter types, split by direction and parametrization
+    type_counts = adapter_type.counts()
+    type_directions = Counter(zip(adapter_type.codes, direction.codes))
+    type_parametrized = Counter(zip(adapter_type.codes, parametrized.codes))
+    # Every type gets a count for every direction, so that the columns line up
+    direction_names = sorted(name or 'Unknown' for name in directions)
+    adapter_types = []
+    for code, total in by_count(type_counts, types):
+        entry = {'AdapterType': types[code], 'Adapters': total, 'Share': ratio(total, snapshot.rows)}
+        entry.update((name, 0) for name in direction_names)
+        for (type_code, direction_code), n in type_directions.items():
+            if type_code == code:
+                entry[directions[direction_code] or 'Unknown'] = n
+        entry['Parametrized'] = sum(n for (type_code, flag), n in type_parametrized.items()
+                                    if type_code == code and is_parametrized[flag])
+        entry['ParametrizedRatio'] = ratio(entry['Parametrized'], total)
+        adapter_types.append(entry)
+
+    # Packages: adapters, and iflows counted once each
+    package_iflows = Counter(code for code, _ in set(zip(package.codes, uid.codes)))
+    packages = [{'Package': package.values[code], 'Iflows': package_iflows[code], 'Adapters': n}
+                for code, n in by_count(package.counts(), package.values)]
+
+    # Version spread: adapter versions per adapter type, iflow versions once per iflow
+    adapter_versions = []
+    type_versions = Counter(zip(adapter_type.codes, version.codes))
+    for code, _ in by_count(type_counts, types):
+        spread = {versions[version_code]: n for (type_code, version_code), n in type_versions.items()
+                  if type_code == code}
+        adapter_versions.append({'AdapterType': types[code], 'Distinct': len(spread),
+                                 'Versions': dict(by_count(spread))})
+    iflow_versions = Counter(code for _, code in set(zip(uid.codes, iflow_version.codes)))
+    iflow_versions = {iflow_version.values[code]: n for code, n in by_count(iflow_versions, iflow_version.values)}
+
+    # Endpoints shared by the most iflows
+    blank = address.index.get('')
+    endpoint_iflows = Counter(code for code, _ in set(zip(address.codes, uid.codes)) if code != blank)
+    endpoint_adapters = address.counts()
+    endpoint_types = {}
+    for code, type_code in set(zip(address.codes, adapter_type.codes)):
+        endpoint_types.setdefault(code, set()).add(types[type_code])
+    shared_endpoints = [{'Address': address.values[code], 'Iflows': n, 'Adapters': endpoint_adapters[code],
+                         'AdapterTypes': ', '.join(sorted(endpoint_types[code]))}
+                        for code, n in by_count(endpoint_iflows, address.values)[:top] if n > 1]
+
+    return {'name': snapshot.name, 'totals': totals, 'adapter_types': adapter_types, 'packages': packages,
+            'adapter_versions': adapter_versions, 'iflow_versions': iflow_versions,
+            'shared_endpoints': shared_endpoints}
+
+
+def history(summaries):
+    # One line per snapshot, with the adapter count of every type seen in any of them
+    types = list(dict.fromkeys(entry['AdapterType'] for summary in summaries for entry in summary['adapter_types']))
+    lines = []
+    for summary in summaries:
+        line = {'Snapshot': summary['name'], 'Packages': summary['totals']['packages'],
+                'Iflows': summary['totals']['iflows'], 'Adapters': summary['totals']['adapters'],
+                'ParametrizedRatio': summary['totals']['parametrized_ratio']}
+        counts = {entry['AdapterType']: entry['Adapters'] for entry in summary['adapter_types']}
+        line.update((adapter_type, counts.get(adapter_type, 0)) for adapter_type in types)
+        lines.append(line)
+    return lines
+
+
+def build_report(snapshots, top=DEFAULT_TOP):
+    summaries = [summarize(snapshot, top) for snapshot in snapshots]
+    report = {'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'snapshots': summaries}
+    if len(summaries) > 1:
+        report['history'] = history(summaries)
+    return report
+
+
+STYLE = (
+    'body{font-family:sans-serif;margin:2em;color:#222}'
+    'table{border-collapse:collapse;margin:0 0 1.5em}'
+    'th,td{border:1px solid #ccc;padding:3px 8px;text-align:left;vertical-align:top}'
+    'th{background:#eee}'
+    'td.bar{min-width:160px}'
+    'td.bar span{display:inline-block;height:10px;background:#4a7fb5}'
+)
+
+
+def html_table(rows, columns=None, bar=None):
+    # `bar` names a 0..1 column that is also drawn as a bar
+    if not rows:
+        return '<p>None.</p>'
+    columns = columns or list(dict.fromkeys(key for row in rows for key in row))
+    lines = ['<table><tr>' + ''.join(f'<th>{escape(column)}</th>' for column in columns) + '</tr>']
+    for row in rows:
+        cells = []
+        for column in columns:
+            value = row.get(column, '')
+            if isinstance(value, dict):
+                value = ', '.join(f'{key or "(none)"}: {n}' for key, n in value.items())
+            if column == bar:
+                cells.append(f'<td class="bar"><span style="width:{value * 100:.1f}%"></span> {value:.1%}</td>')
+            else:
+                cells.append(f'<td>{escape(text(value))}</td>')
+        lines.append('<tr>' + ''.join(cells) + '</tr>')
+    lines.append('</table>')
+    return '\n'.join(lines)
+
+
+def render_html(report):
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>Integration landscape</title>',
+             f'<style>{STYLE}</style></head><body>', '<h1>Integration landscape</h1>',
+             f'<p>Generated {escape(report["generated_at"])}.</p>']
+    if 'history' in report:
+        parts += ['<h2>History</h2>', html_table(report['history'])]
+    for summary in report['snapshots']:
+        totals = summary['totals']
+        parts += [f'<h2>{escape(summary["name"])}</h2>',
+                  f'<p>{totals["packages"]} packages, {totals["iflows"]} iflows, {totals["adapters"]} adapters; '
+                  f'{totals["parametrized_ratio"]:.1%} of the adapters are parametrized.</p>',
+                  '<h3>Adapter types</h3>', html_table(summary['adapter_types'], bar='Share'),
+                  '<h3>Most shared endpoints</h3>', html_table(summary['shared_endpoints']),
+                  '<h3>Adapter versions</h3>', html_table(summary['adapter_versions']),
+                  '<h3>Iflow versions</h3>',
+                  html_table([{'IflowVersion': key, 'Iflows': n} for key, n in summary['iflow_versions'].items()]),
+                  '<h3>Packages</h3>', html_table(summary['packages'])]
+    parts.append('</body></html>')
+    return '\n'.join(parts)
+
+
+def write_report(report, output_base):
+    with open(output_base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    with open(output_base + '.html', 'w', encoding='utf-8') as f:
+        f.write(render_html(report))
+
+
+class ReportWriter:
+    # Collects the rows of a run as they are written; the report is built on close()
+
+    def __init__(self, output_path, fieldnames=None, name=None, top=DEFAULT_TOP):
+        self.output_path = output_path
+        self.rows_written = 0
+        self.top = top
+        self.snapshot = Snapshot(name or os.path.basename(os.path.splitext(output_path)[0]))
+
+    def write_rows(self, rows):
+        self.snapshot.add_rows(rows)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self.snapshot is not None:
+            write_report(build_report([self.snapshot], self.top), os.path.splitext(self.output_path)[0])
+            self.snapshot = None
+
+    def summary(self):
+        output_base = os.path.splitext(self.output_path)[0]
+        return f"✅ Saved report of {self.rows_written} adapters into '{output_base}.json' and '{output_base}.html'."
+
+
+def snapshot_name(source):
+    return os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+
+
+def read_snapshot(source):
+    # A CSV from an earlier run, or a directory of package zips (extracted in memory)
+    snapshot = Snapshot(snapshot_name(source))
+    if os.path.isdir(source):
+        import AsisApi
+        return snapshot.add_rows(AsisApi.extract(source))
+    return snapshot.add_csv(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the adapters of one or more export snapshots.")
+    parser.add_argument('sources', nargs='+', metavar='SNAPSHOT',
+                        help="CSV produced by AutomaticASIS.py, or a directory with package zips; several "
+                             "snapshots, oldest first, also get a history table")
+    parser.add_argument('--output', default=REPORT_FILE, metavar='BASE',
+                        help=f"write BASE.json and BASE.html (default {REPORT_FILE})")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, metavar='N',
+                        help=f"number of shared endpoints listed (default {DEFAULT_TOP})")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    snapshots = []
+    for source in args.sources:
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"'{source}' not found.")
+        snapshots.append(read_snapshot(source))
+        print(f"📊 Read {snapshots[-1].rows} adapters from '{source}'.")
+    write_report(build_report(snapshots, args.top), args.output)
+    print(f"✅ Saved report into '{args.output}.json' and '{args.output}.html' "
+          f"({time.perf_counter() - start:.2f}s).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import abc
+import csv
+
+import AdapterRows
+
+# Repeated, low-cardinality columns that columnar formats store dictionary encoded
+DICTIONARY_FIELDS = {'UID', 'Package', 'Iflow', 'IflowID', 'IflowVersion', 'AdapterType', 'TransportProtocol',
+                     'AdapterDirection', 'AdapterName', 'AdapterVersion', 'Fingerprint', 'ParameterSources'}
+# Adapter row columns stored with their own type; every other column is a string.
+# Step tables pass their own types to the writer.
+FIELD_TYPES = {'IsParametrized': bool, 'ResolvedParameters': int}
+
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrows'}
+DEFAULT_BATCH_SIZE = 10000
+
+
+def to_int(value):
+    return None if value is None or value == '' else int(value)
+
+
+def to_str(value):
+    return None if value is None else str(value)
+
+
+CONVERTERS = {bool: AdapterRows.is_true, int: to_int}
+
+
+class CsvWriter:
+    def __init__(self, output_path, fieldnames, field_types=None):
+        self.output_path = output_path
+        self.fieldnames = fieldnames
+        self.rows_written = 0
+        self._file = None
+        self._writer = None
+
+    def write_rows(self, rows):
+        if not rows:
+            return
+        # The file is only created once there is something to write
+        if self._file is None:
+            self._file = open(self.output_path, mode='w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file, quoting=csv.QUOTE_ALL)
+            self._writer.writerow(self.fieldnames)
+        self._writer.writerows(AdapterRows.as_tuples(rows, self.fieldnames))
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ArrowWriter(abc.ABC):
+    # Buffers rows column by column and writes them as Arrow record batches.
+    # Subclasses open the actual sink (Parquet file or Arrow IPC stream).
+
+    def __init__(self, output_path, fieldnames, field_types=None, batch_size=DEFAULT_BATCH_SIZE):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("Columnar output needs pyarrow (pip install pyarrow).") from None
+        self.pa = pyarrow
+        self.output_path = output_path
+        self.fieldnames = fieldnames
+        self.field_types = FIELD_TYPES if field_types is None else field_types
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self.schema = pyarrow.schema([self._field(name) for name in fieldnames])
+        self._columns = [[] for _ in fieldnames]
+        self._converters = [CONVERTERS.get(self.field_types.get(name), to_str) for name in fieldnames]
+        self._buffered = 0
+        self._sink = None
+
+    def _field(self, name):
+        pa = self.pa
+        field_type = self.field_types.get(name)
+        if field_type is bool:
+            return pa.field(name, pa.bool_())
+        if field_type is int:
+            return pa.field(name, pa.int32())
+        if name in DICTIONARY_FIELDS:
+            return pa.field(name, pa.dictionary(pa.int32(), pa.string()))
+        return pa.field(name, pa.string())
+
+    @abc.abstractmethod
+    def _open_sink(self):
+        pass
+
+    def write_rows(self, rows):
+        columns = list(zip(self._columns, self._converters))
+        for values in AdapterRows.as_tuples(rows, self.fieldnames):
+            for (column, convert), value in zip(columns, values):
+                column.append(convert(value))
+        self._buffered += len(rows)
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffered:
+            return
+        arrays = [self.pa.array(column, type=field.type) for column, field in zip(self._columns, self.schema)]
+        batch = self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self._sink is None:
+            self._sink = self._open_sink()
+        self._sink.write_batch(batch)
+        self.rows_written += self._buffered
+        self._columns = [[] for _ in self.fieldnames]
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+
+class ParquetWriter(ArrowWriter):
+    def _open_sink(self):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(self.output_path, self.schema, use_dictionary=True)
+
+
+class ArrowStreamWriter(ArrowWriter):
+    # The IPC stream format allows each batch to carry its own dictionaries
+    def _open_sink(self):
+        import pyarrow.ipc
+        return pyarrow.ipc.new_stream(self.output_path, self.schema)
+
+
+WRITERS = {'csv': CsvWriter, 'parquet': ParquetWriter, 'arrow': ArrowStreamWriter}
+
+
+def open_writer(output_format, output_base, fieldnames, field_types=None):
+    if output_format not in WRITERS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return WRITERS[output_format](output_base + EXTENSIONS[output_format], fieldnames, field_types)
@@ -0,0 +1,173 @@
+import functools
+import os
+import re
+import sys
+
+IFLOW_LAYER = 'parameters.prop'
+# Where the Integration Suite export keeps an iflow's externalized parameters
+PARAMETERS_PATH = os.path.join('src', 'main', 'resources', 'parameters.prop')
+
+PLACEHOLDER_PATTERN = re.compile(r'{{(.*?)}}')
+LINE_BREAK = re.compile(r'\r\n|\r|\n')
+ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|.)', re.DOTALL)
+ESCAPED_CHARS = {'t': '\t', 'n': '\n', 'r': '\r', 'f': '\f'}
+WHITESPACE = ' \t\f'
+SEPARATORS = '=:' + WHITESPACE
+
+
+def _unescape_match(match):
+    escaped = match.group(1)
+    if len(escaped) == 5:
+        return chr(int(escaped[1:], 16))
+    return ESCAPED_CHARS.get(escaped, escaped)
+
+
+def unescape(text):
+    return ESCAPE.sub(_unescape_match, text) if '\\' in text else text
+
+
+def logical_lines(text):
+    # java.util.Properties rules: comments start with # or !, and a line ending
+    # in an odd number of backslashes continues on the next line
+    pending = None
+    for line in LINE_BREAK.split(text):
+        line = line.lstrip(WHITESPACE)
+        if pending is None:
+            if not line or line[0] in '#!':
+                continue
+        else:
+            line = pending + line
+        if (len(line) - len(line.rstrip('\\'))) % 2:
+            pending = line[:-1]
+            continue
+        pending = None
+        yield line
+    if pending:
+        yield pending
+
+
+def split_entry(line):
+    # The key ends at the first unescaped '=', ':' or whitespace
+    end = 0
+    while end < len(line):
+        char = line[end]
+        if char == '\\':
+            end += 2
+        elif char in SEPARATORS:
+            break
+        else:
+            end += 1
+    value = line[end:].lstrip(WHITESPACE)
+    if value[:1] in ('=', ':'):
+        value = value[1:].lstrip(WHITESPACE)
+    return unescape(line[:end]), unescape(value)
+
+
+def parse_properties(text):
+    intern = sys.intern
+    params = {}
+    for line in logical_lines(text):
+        key, value = split_entry(line)
+        params[intern(key)] = intern(value)
+    return params
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_properties_bytes(data):
+    # Many iflows ship identical parameters.prop files; they are parsed once.
+    # The returned dict is shared, so callers must not modify it.
+    return parse_properties(data.decode('utf-8'))
+
+
+def find_parameters_file(root_dir):
+    path = os.path.join(root_dir, PARAMETERS_PATH)
+    if os.path.isfile(path):
+        return path
+    for root, _, files in os.walk(root_dir):
+        if 'parameters.prop' in files:
+            return os.path.join(root, 'parameters.prop')
+    return None
+
+
+def load_properties(path):
+    with open(path, 'rb') as f:
+        return parse_properties_bytes(f.read())
+
+
+def file_stamps(paths):
+    stamps = []
+    for path in paths:
+        stat = os.stat(path)
+        stamps.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def load_overrides(paths):
+    # Environment override files, later files win; key -> (value, source layer).
+    # Files are loaded again once they are modified.
+    return _load_overrides(file_stamps(paths))
+
+
+@functools.lru_cache(maxsize=32)
+def _load_overrides(stamps):
+    overrides = {}
+    for path, _, _ in stamps:
+        layer = sys.intern(os.path.basename(path))
+        for key, value in load_properties(path).items():
+            overrides[key] = (value, layer)
+    return overrides
+
+
+class LayeredParameters:
+    # An iflow's parameters.prop with the environment overrides on top of it
+
+    __slots__ = ('parameters', 'overrides')
+
+    def __init__(self, parameters, overrides=None):
+        self.parameters = parameters
+        self.overrides = overrides or {}
+
+    def lookup(self, key):
+        hit = self.overrides.get(key)
+        if hit is not None:
+            return hit
+        value = self.parameters.get(key)
+        if value is None:
+            return None
+        return value, IFLOW_LAYER
+
+
+def as_layers(parameters):
+    if isinstance(parameters, LayeredParameters):
+        return parameters
+    return LayeredParameters(parameters)
+
+
+def substitute(address, parameters):
+    # Resolves every {{placeholder}} in a single pass over the address.
+    # Returns (address, resolved, unresolved keys, source layers).
+    if '{{' not in address:
+        return address, 0, [], []
+
+    lookup = as_layers(parameters).lookup
+    parts = []
+    position = 0
+    resolved = 0
+    unresolved = []
+    sources = []
+    for match in PLACEHOLDER_PATTERN.finditer(address):
+        parts.append(address[position:match.start()])
+        hit = lookup(match.group(1).strip())
+        if hit is None:
+            parts.append(match.group(0))
+            unresolved.append(match.group(1).strip())
+        else:
+            parts.append(hit[0])
+            resolved += 1
+            if hit[1] not in sources:
+                sources.append(hit[1])
+        position = match.end()
+    if not parts:
+        return address, 0, [], []
+    parts.append(address[position:])
+    return ''.join(parts), resolved, unresolved, sources
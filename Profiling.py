@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+# Stage records of the current process; None while profiling is off, so
+# every instrumented stage costs a single function call.
+_records = None
+# Records merged back from worker processes
+_collected = []
+
+_DISABLED = nullcontext()
+# Last stage entered in this process, so errors can say where they happened
+_last_stage = None
+
+
+def enable():
+    global _records
+    if _records is None:
+        _records = []
+
+
+def disable():
+    global _records
+    _records = None
+    _collected.clear()
+
+
+def mark(name):
+    global _last_stage
+    _last_stage = name
+
+
+def last_stage():
+    return _last_stage
+
+
+def stage(name, package=None, iflow=None):
+    global _last_stage
+    _last_stage = name
+    if _records is None:
+        return _DISABLED
+    return _record(name, package, iflow)
+
+
+@contextmanager
+def _record(name, package, iflow):
+    record = {'stage': name, 'package': package, 'iflow': iflow}
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield record
+    finally:
+        record['wall'] = time.perf_counter() - wall
+        record['cpu'] = time.process_time() - cpu
+        _records.append(record)
+
+
+def take():
+    if _records is None:
+        return []
+    records = _records[:]
+    _records.clear()
+    return records
+
+
+def call(func, *args):
+    # Runs func in a (possibly worker) process and ships its records back
+    return func(*args), take()
+
+
+def merge(result):
+    value, records = result
+    _collected.extend(records)
+    return value
+
+
+def collect():
+    records = _collected + take()
+    _collected.clear()
+    return records
+
+
+def _add(totals, record):
+    entry = totals.setdefault(record['stage'], {'count': 0, 'wall': 0.0, 'cpu': 0.0})
+    entry['count'] += 1
+    entry['wall'] += record['wall']
+    entry['cpu'] += record['cpu']
+    for key in ('bytes', 'elements', 'rows'):
+        if key in record:
+            entry[key] = entry.get(key, 0) + record[key]
+
+
+def build_report(records, wall, cpu, options=None):
+    stages = {}
+    packages = {}
+    iflows = {}
+    for record in records:
+        _add(stages, record)
+        if record['package'] is not None:
+            _add(packages.setdefault(record['package'], {}), record)
+            if record['iflow'] is not None:
+                _add(iflows.setdefault((record['package'], record['iflow']), {}), record)
+    return {
+        'run': {'wall': wall, 'cpu': cpu, 'pid': os.getpid(), 'options': options or {}},
+        'stages': stages,
+        'packages': packages,
+        'iflows': [{'package': package, 'iflow': iflow, 'stages': totals}
+                   for (package, iflow), totals in iflows.items()],
+    }
+
+
+def write_report(report, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,155 @@
+import glob
+import json
+import os
+
+import AdapterRows
+import ExtractionCache
+
+CHECKPOINT_SUFFIX = '_checkpoint.jsonl'
+ERRORS_SUFFIX = '_errors.json'
+
+
+def error_entry(zip_path, package, inner_zip, error):
+    stage, exception, message = error
+    return {'zip': os.path.basename(zip_path), 'package': package, 'inner_zip': inner_zip, 'stage': stage,
+            'exception': exception, 'message': message}
+
+
+def new_record(zip_path, package_name, uid_prefix, iflow_count):
+    try:
+        digest = ExtractionCache.file_digest(zip_path)
+    except OSError:
+        digest = None
+    return {'zip': os.path.basename(zip_path), 'digest': digest, 'package': package_name, 'uid_prefix': uid_prefix,
+            'iflows': iflow_count, 'rows': [], 'errors': []}
+
+
+def load_records(path):
+    # One JSON object per finished package; a line cut short by a crash is ignored
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+    return records
+
+
+def find_checkpoint(directory='.', output_base=None):
+    # A run given its own output base can only resume that run's checkpoint
+    if output_base:
+        path = output_base + CHECKPOINT_SUFFIX
+        return path if os.path.isfile(path) else None
+    candidates = glob.glob(os.path.join(directory, 'automatic_asis_*' + CHECKPOINT_SUFFIX))
+    return os.path.normpath(max(candidates, key=os.path.getmtime)) if candidates else None
+
+
+def output_base_of(checkpoint_path):
+    return checkpoint_path[:-len(CHECKPOINT_SUFFIX)]
+
+
+def finished_prefix(records, zip_paths):
+    # Packages can only be skipped up to the first one that is missing or changed,
+    # so that the UIDs of everything after it match an uninterrupted run
+    by_zip = {record['zip']: record for record in records}
+    skipped = []
+    for zip_path in zip_paths:
+        record = by_zip.get(os.path.basename(zip_path))
+        if record is None or record['digest'] != ExtractionCache.file_digest(zip_path):
+            break
+        skipped.append(record)
+    return skipped
+
+
+def restore_counter(records):
+    package_iflow_counter = {}
+    for record in records:
+        if record['uid_prefix'] is not None:
+            package_iflow_counter[record['uid_prefix']] = (
+                package_iflow_counter.get(record['uid_prefix'], 0) + record['iflows'])
+    return package_iflow_counter
+
+
+def uid_number(uid):
+    return int(uid.rpartition('-')[2])
+
+
+def replay_rows(records):
+    # Yields the saved rows of each inner zip, as the extraction would have;
+    # within a package, UIDs are numbered in processing order
+    for record in records:
+        groups = {}
+        for row in record['rows']:
+            groups.setdefault(row['UID'], []).append(row)
+        tables = {}
+        for name, rows in record.get('tables', {}).items():
+            for row in rows:
+                tables.setdefault(row['UID'], {}).setdefault(name, []).append(row)
+        for uid in sorted(groups.keys() | tables.keys(), key=uid_number):
+            rows = AdapterRows.from_dicts(groups.get(uid, ()), uid, record['package'])
+            if uid in tables:
+                rows = AdapterRows.RowBatch(rows, tables[uid])
+            yield rows
+
+
+class RunManifest:
+    # Appends a record to the checkpoint file once every inner zip of a package
+    # has a result, and collects structured errors for the error report.
+
+    def __init__(self, output_base, records=()):
+        self.path = output_base + CHECKPOINT_SUFFIX
+        self.errors_path = output_base + ERRORS_SUFFIX
+        self.errors = [error for record in records for error in record['errors']]
+        self._packages = {}
+        # Rewritten so that records of packages that will be processed again are dropped
+        self._file = open(self.path, 'w', encoding='utf-8')
+        for record in records:
+            self._write(record)
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def start_package(self, zip_path, package_name, uid_prefix, iflow_count):
+        record = new_record(zip_path, package_name, uid_prefix, iflow_count)
+        if iflow_count:
+            self._packages[zip_path] = [record, iflow_count]
+        else:
+            self._write(record)
+
+    def package_error(self, zip_path, error):
+        # The package could not be opened; it counts as finished, with its error
+        record = new_record(zip_path, None, None, 0)
+        self._add_error(record, zip_path, None, None, error)
+        self._write(record)
+
+    def _add_error(self, record, zip_path, package, inner_zip, error):
+        entry = error_entry(zip_path, package, inner_zip, error)
+        record['errors'].append(entry)
+        self.errors.append(entry)
+
+    def add_result(self, zip_path, inner_zip, flows=None, error=None):
+        entry = self._packages.get(zip_path)
+        if entry is None:
+            return
+        record = entry[0]
+        if error is not None:
+            self._add_error(record, zip_path, record['package'], inner_zip, error)
+        else:
+            record['rows'].extend(dict(row.items()) for row in flows)
+            for name, rows in getattr(flows, 'tables', {}).items():
+                record.setdefault('tables', {}).setdefault(name, []).extend(rows)
+        entry[1] -= 1
+        if not entry[1]:
+            self._write(self._packages.pop(zip_path)[0])
+
+    def close(self, completed):
+        # A finished run no longer needs its checkpoint; the error report is kept
+        self._file.close()
+        if completed:
+            os.remove(self.path)
+        if self.errors:
+            with open(self.errors_path, 'w', encoding='utf-8') as f:
+                json.dump(self.errors, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,146 @@
+import argparse
+import csv
+import json
+import os
+
+import ExtractionCache
+from AdapterRows import text
+
+KEY_FIELDS = ('IflowID', 'AdapterName', 'AdapterDirection')
+COMPARED_FIELDS = ('AdapterType', 'TransportProtocol', 'AdapterVersion', 'AdapterAddress', 'IsParametrized')
+REPORT_FIELDNAMES = ['Change', 'IflowID', 'Iflow', 'AdapterName', 'AdapterDirection', 'Field', 'Left', 'Right']
+SYMBOLS = {'added': '➕', 'removed': '➖', 'changed': '✏️ ', 'version_bump': '⬆️ ', 'iflow_added': '➕',
+           'iflow_removed': '➖'}
+
+
+def load_rows(source, cache_path=None, jobs=1):
+    # A CSV from an earlier run is read as is; a directory of package zips is extracted
+    if os.path.isfile(source):
+        with open(source, newline='', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+    import AutomaticASIS
+    zip_paths = AutomaticASIS.discover_zip_files(source)
+    if not zip_paths:
+        raise FileNotFoundError(f"No zip files found in '{source}'.")
+    return AutomaticASIS.extract_packages(zip_paths, in_memory=True, jobs=jobs, cache_path=cache_path)
+
+
+def index_adapters(rows):
+    # Hash index on (IflowID, AdapterName, AdapterDirection); repeated keys are
+    # told apart by their order of appearance within the iflow
+    index = {}
+    occurrences = {}
+    for row in rows:
+        key = tuple(text(row.get(field)) for field in KEY_FIELDS)
+        n = occurrences[key] = occurrences.get(key, 0) + 1
+        index[key + (n,)] = row
+    return index
+
+
+def index_iflows(rows):
+    iflows = {}
+    for row in rows:
+        iflow_id = text(row.get('IflowID'))
+        if iflow_id not in iflows:
+            iflows[iflow_id] = row
+    return iflows
+
+
+def entry(change, key, row, field='', left='', right=''):
+    return {'Change': change, 'IflowID': key[0], 'Iflow': text(row.get('Iflow')), 'AdapterName': key[1],
+            'AdapterDirection': key[2], 'Field': field, 'Left': left, 'Right': right}
+
+
+def diff_rows(left_rows, right_rows):
+    left = index_adapters(left_rows)
+    right = index_adapters(right_rows)
+    changes = []
+
+    for key, row in left.items():
+        other = right.get(key)
+        if other is None:
+            changes.append(entry('removed', key, row, left=text(row.get('AdapterAddress'))))
+            continue
+        for field in COMPARED_FIELDS:
+            a, b = text(row.get(field)), text(other.get(field))
+            if a != b:
+                changes.append(entry('changed', key, other, field, a, b))
+    for key, row in right.items():
+        if key not in left:
+            changes.append(entry('added', key, row, right=text(row.get('AdapterAddress'))))
+
+    left_iflows = index_iflows(left_rows)
+    right_iflows = index_iflows(right_rows)
+    for iflow_id, row in left_iflows.items():
+        other = right_iflows.get(iflow_id)
+        if other is None:
+            changes.append(entry('iflow_removed', (iflow_id, '', ''), row, 'IflowVersion',
+                                 left=text(row.get('IflowVersion'))))
+        elif text(row.get('IflowVersion')) != text(other.get('IflowVersion')):
+            changes.append(entry('version_bump', (iflow_id, '', ''), other, 'IflowVersion',
+                                 text(row.get('IflowVersion')), text(other.get('IflowVersion'))))
+    for iflow_id, row in right_iflows.items():
+        if iflow_id not in left_iflows:
+            changes.append(entry('iflow_added', (iflow_id, '', ''), row, 'IflowVersion',
+                                 right=text(row.get('IflowVersion'))))
+
+    changes.sort(key=lambda c: (c['IflowID'], c['AdapterDirection'], c['AdapterName'], c['Change'], c['Field']))
+    return changes
+
+
+def summarize(changes):
+    summary = {}
+    for change in changes:
+        summary[change['Change']] = summary.get(change['Change'], 0) + 1
+    return summary
+
+
+def write_report(changes, output_path, left_name, right_name):
+    if output_path.lower().endswith('.json'):
+        report = {'left': left_name, 'right': right_name, 'summary': summarize(changes), 'changes': changes}
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return
+    with open(output_path, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDNAMES, quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        writer.writerows(changes)
+
+
+def describe(change):
+    label = f"{change['IflowID']}"
+    if change['AdapterName']:
+        label += f" / {change['AdapterName']} ({change['AdapterDirection']})"
+    if change['Change'] in ('changed', 'version_bump'):
+        return f"{label}: {change['Field']} '{change['Left']}' → '{change['Right']}'"
+    return label
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the adapters of two Integration Suite export snapshots.")
+    parser.add_argument('left', help="directory with package zips, or a CSV produced by AutomaticASIS.py")
+    parser.add_argument('right', help="directory with package zips, or a CSV produced by AutomaticASIS.py")
+    parser.add_argument('--output', metavar='FILE', help="write the changes as .csv or .json")
+    parser.add_argument('--cache', nargs='?', const=ExtractionCache.CACHE_FILE, metavar='PATH',
+                        help="reuse rows of unchanged iflows from the AutomaticASIS extraction cache")
+    parser.add_argument('--jobs', type=int, default=1, metavar='N', help="number of worker processes")
+    parser.add_argument('--quiet', action='store_true', help="only print the summary")
+    args = parser.parse_args(argv)
+
+    left_rows = load_rows(args.left, args.cache, args.jobs)
+    right_rows = load_rows(args.right, args.cache, args.jobs)
+    changes = diff_rows(left_rows, right_rows)
+
+    print(f"✅ Compared {len(left_rows)} adapters in '{args.left}' with {len(right_rows)} in '{args.right}'.")
+    if not args.quiet:
+        for change in changes:
+            print(f"  {SYMBOLS[change['Change']]} {change['Change']}: {describe(change)}")
+    summary = summarize(changes)
+    print(', '.join(f"{count} {change}" for change, count in sorted(summary.items())) or "No differences.")
+    if args.output:
+        write_report(changes, args.output, args.left, args.right)
+        print(f"✅ Saved {len(changes)} changes into '{args.output}'.")
+
+
+if __name__ == '__main__':
+    main()